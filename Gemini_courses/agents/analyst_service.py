@@ -0,0 +1,308 @@
+"""Resident analysts service.
+
+A long-running local HTTP server keeping the model clients, prompt templates and Pydantic schemas warm between
+analyses. Requests are queued by priority and deadline, run on a bounded number of model server slots, and the
+results of the analysis nodes are streamed back as JSON lines as they complete:
+    POST /analyses {"analyst": "technical", "stock": "AAPL", "priority": 0, "deadline": 600}
+    -> {"event": "queued", ...}, {"event": "started", ...}, {"event": "node", ...}, ..., {"event": "done", "report": {...}}
+    GET /status -> queue length, in-flight analyses, memory usage and Ollama model reloads
+
+Requests are rejected with 429 when the queue is full and with 503 when the memory usage is over its limit.
+
+Run it from the `Gemini_courses` directory:
+    python -m agents.analyst_service --port 8765 --slots 2
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .esg_analyst import esg_analysis_LLM_logic as _esg_logic
+from .technical_analyst import technical_analysis_LLM_logic as _technical_logic
+
+
+# Analysts classes and Pydantic models of their reports, by name.
+ANALYSTS = {
+    "technical": (_technical_logic.TechnicalAnalysisLLMLogic, _technical_logic._pydantic_models.TickerTechnicalAnalysis),
+    "esg": (_esg_logic.ESGAnalysisLLMLogic, _esg_logic._pydantic_models.TickerESGAnalysis),
+}
+
+
+def memory_usage_mb():
+    """Return the resident memory of the process in MB, None if it can not be read."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class DeadlineExceeded(Exception):
+    """Raised between two nodes when the deadline of an analysis is over."""
+
+
+class AnalysisRequest():
+    """An analysis request with the queue of its events."""
+
+    def __init__(self, analyst: str, stock: str, priority: int = 0, deadline: float = None, options: dict = None):
+        """
+        Args:
+            analyst (str): Name of the analyst, "technical" or "esg".
+            stock (str): Ticker of the stock to analyse.
+            priority (int): Priority of the analysis, the lowest first.
+            deadline (float): Maximum time in seconds from the submission to the end of the analysis.
+            options (dict): Additionnal arguments of the analyst, e.g. {"aggregation_mode": "rules"}.
+        """
+        self.analyst = analyst
+        self.stock = stock
+        self.priority = priority
+        self.submitted = time.time()
+        self.deadline = self.submitted + deadline if deadline is not None else None
+        self.options = options or {}
+        self.events = queue.Queue()
+
+    def emit(self, event: str, **values):
+        self.events.put(dict(event=event, stock=self.stock, time=round(time.time() - self.submitted, 3), **values))
+
+    def check_deadline(self):
+        if self.deadline is not None and time.time() > self.deadline:
+            raise DeadlineExceeded(f"Deadline of the {self.analyst} analysis of {self.stock} exceeded.")
+
+
+class AnalystService():
+    """Priority and deadline queue of the analyses run on a bounded number of model server slots."""
+
+    def __init__(self, slots: int = 2, max_queue: int = 32, max_memory_mb: float = None, model_params: dict = None, prewarm_ollama: bool = False):
+        """
+        Args:
+            slots (int): Number of analyses run at the same time, i.e. the parallel slots of the model servers.
+            max_queue (int): Maximum number of waiting analyses, further requests are rejected.
+            max_memory_mb (float): Resident memory above which requests are rejected, no limit if None.
+            model_params (dict): Additionnal parameters of the chat models, e.g. {"base_url": "http://localhost:11434"}.
+            prewarm_ollama (bool): Whether `warm_up` also loads the Ollama models in every context size bucket.
+        """
+        self.slots = slots
+        self.prewarm_ollama = prewarm_ollama
+        self.max_queue = max_queue
+        self.max_memory_mb = max_memory_mb
+        self.model_params = model_params or {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self._stopped = False
+        self._workers = []
+
+    def warm_up(self):
+        """Build the Pydantic schemas, retry prompts and model clients of every analysis node ahead of the requests."""
+        registry = None
+        for analyst_class, report_model in ANALYSTS.values():
+            pydantic_models = {report_model}
+            for name, value in vars(analyst_class).items():
+                if name.endswith("_PYDANTIC_MODELS"):
+                    pydantic_models.update(value.values())
+            analyst_class.get_retry_prompt_template()
+            registry = analyst_class.MODEL_REGISTRY
+            for pydantic_model in pydantic_models:
+                # The schemas of the Pydantic models are built at first use.
+                pydantic_model.model_json_schema()
+                analyst_class.MODEL_REGISTRY.resolve(pydantic_model=pydantic_model, num_ctx=4092 * 4, num_predict=1000 * 4, extract_reasoning=True,
+                                                     **self.model_params)
+                analyst_class.MODEL_REGISTRY.resolve(pydantic_model=pydantic_model, structured_output=True, include_raw=True, num_ctx=4092 * 2,
+                                                     num_predict=1000 * 2, extract_reasoning=True, **self.model_params)
+        if self.prewarm_ollama and registry is not None and registry.residency is not None:
+            registry.warm_up_ollama()
+
+    def status(self) -> dict:
+        residency = ANALYSTS["technical"][0].MODEL_REGISTRY.residency
+        with self._condition:
+            return {"queued": len(self._heap), "in_flight": self.in_flight, "slots": self.slots, "completed": self.completed,
+                    "failed": self.failed, "memory_mb": memory_usage_mb(), "ollama": residency.report() if residency is not None else None}
+
+    def submit(self, request: AnalysisRequest):
+        """Queue an analysis request, return None if accepted or the (HTTP status, reason) of its rejection."""
+        if request.analyst not in ANALYSTS:
+            return 400, f"Unknown analyst '{request.analyst}', expected one of {list(ANALYSTS)}."
+        memory = memory_usage_mb()
+        if self.max_memory_mb is not None and memory is not None and memory > self.max_memory_mb:
+            return 503, f"Memory usage {memory:.0f} MB over the {self.max_memory_mb} MB limit."
+        with self._condition:
+            if len(self._heap) >= self.max_queue:
+                return 429, f"Queue full ({self.max_queue} analyses waiting)."
+            deadline = request.deadline if request.deadline is not None else float("inf")
+            heapq.heappush(self._heap, (request.priority, deadline, next(self._counter), request))
+            request.emit("queued", position=len(self._heap), in_flight=self.in_flight)
+            self._condition.notify()
+        return None
+
+    def _next_request(self):
+        with self._condition:
+            while not self._heap and not self._stopped:
+                self._condition.wait()
+            if self._stopped:
+                return None
+            request = heapq.heappop(self._heap)[-1]
+            self.in_flight += 1
+            return request
+
+    def run_analysis(self, request: AnalysisRequest):
+        """Run an analysis, emitting the result of every node as it completes."""
+        analyst = ANALYSTS[request.analyst][0](stock=request.stock, model_params=self.model_params, **request.options)
+        generic_output_parser = analyst.generic_output_parser
+
+        def _node_output_parser(pydantic_model, *args, **kwargs):
+            request.check_deadline()
+            result = generic_output_parser(pydantic_model, *args, **kwargs)
+            request.emit("node", node=pydantic_model.__name__, latency=analyst.timers[-1] if analyst.timers else None,
+                         result=json.loads(result.model_dump_json(by_alias=True)))
+            return result
+
+        analyst.generic_output_parser = _node_output_parser
+        if request.analyst == "technical":
+            return analyst.tickers_output_parser(timeframe=[analyst.short_timeframe, analyst.long_timeframe])
+        return analyst.tickers_output_parser()
+
+    def _work(self):
+        while True:
+            request = self._next_request()
+            if request is None:
+                return
+            try:
+                request.check_deadline()
+                request.emit("started")
+                report = self.run_analysis(request)
+            except Exception as error:
+                with self._condition:
+                    self.failed += 1
+                request.emit("expired" if isinstance(error, DeadlineExceeded) else "error", error=repr(error))
+            else:
+                with self._condition:
+                    self.completed += 1
+                request.emit("done", report=json.loads(report.model_dump_json(by_alias=True)))
+            finally:
+                with self._condition:
+                    self.in_flight -= 1
+                request.events.put(None)
+
+    def start(self):
+        """Start the workers of the model server slots."""
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(self.slots)]
+        for worker in self._workers:
+            worker.start()
+
+    def stop(self):
+        """Stop the workers once their running analyses are done, the queued ones are cancelled."""
+        with self._condition:
+            self._stopped = True
+            for *_, request in self._heap:
+                request.emit("cancelled")
+                request.events.put(None)
+            self._heap.clear()
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+
+class AnalystRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler of the analysts service, streaming the events of an analysis as JSON lines."""
+
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def _send_json(self, status: int, value: dict):
+        body = json.dumps(value).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._send_json(200, self.service.status())
+        else:
+            self._send_json(404, {"error": f"Unknown path '{self.path}'."})
+
+    def do_POST(self):
+        if self.path != "/analyses":
+            self._send_json(404, {"error": f"Unknown path '{self.path}'."})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            request = AnalysisRequest(analyst=body.get("analyst", "technical"), stock=body["stock"], priority=body.get("priority", 0),
+                                      deadline=body.get("deadline"), options=body.get("options"))
+        except (ValueError, KeyError, TypeError) as error:
+            self._send_json(400, {"error": repr(error)})
+            return
+        rejection = self.service.submit(request)
+        if rejection is not None:
+            self._send_json(rejection[0], {"error": rejection[1]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        while True:
+            event = request.events.get()
+            if event is None:
+                break
+            self._send_chunk(json.dumps(event).encode() + b"\n")
+        self._send_chunk(b"")
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, warm_up: bool = True, **service_options):
+    """Run the analysts service until interrupted.
+
+    Args:
+        host (str): Host of the HTTP server, local only by default.
+        port (int): Port of the HTTP server.
+        warm_up (bool): Whether to build the schemas, prompt templates and model clients before serving.
+        service_options: Options of `AnalystService`, e.g. slots=2.
+    """
+    service = AnalystService(**service_options)
+    if warm_up:
+        service.warm_up()
+    service.start()
+    handler = type("ServiceRequestHandler", (AnalystRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"Analysts service on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident analysts service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--slots", type=int, default=2, help="Number of analyses run at the same time.")
+    parser.add_argument("--max-queue", type=int, default=32, help="Maximum number of waiting analyses.")
+    parser.add_argument("--max-memory-mb", type=float, default=None, help="Resident memory above which requests are rejected.")
+    parser.add_argument("--endpoint", default=None, help="URL of the model server, e.g. http://localhost:11434.")
+    parser.add_argument("--no-warm-up", action="store_true")
+    parser.add_argument("--prewarm-ollama", action="store_true", help="Load the Ollama models in every context size bucket at startup.")
+    arguments = parser.parse_args()
+    serve(host=arguments.host, port=arguments.port, warm_up=not arguments.no_warm_up, slots=arguments.slots, max_queue=arguments.max_queue,
+          max_memory_mb=arguments.max_memory_mb, model_params={"base_url": arguments.endpoint} if arguments.endpoint else None,
+          prewarm_ollama=arguments.prewarm_ollama)
+
+
+if __name__ == "__main__":
+    main()
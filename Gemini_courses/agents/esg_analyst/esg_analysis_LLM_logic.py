@@ -1,17 +1,10 @@
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import PromptTemplate, ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain.output_parsers.retry import RetryWithErrorOutputParser, NAIVE_RETRY_WITH_ERROR_PROMPT
-from langchain_core.runnables import RunnableParallel, RunnableLambda
-
 from . import esg_analysis_pydantic_model as _pydantic_models
-from time import time as _time
+
+from custom_features.analyst_logic import AnalystLLMLogic
 
 
-class ESGAnalysisLLMLogic():
+class ESGAnalysisLLMLogic(AnalystLLMLogic):
 
-    MODEL = "cogito:8b"
-    DEEP_THINKING_INSTRUCTION = "Enable deep thinking subrouting.\n\n"
     CARBON_EMISSIONS_RAW_VALUE_PYDANTIC_MODELS = {
         "year-1_value": _pydantic_models.Year1RawValues,
         "year-2_value": _pydantic_models.Year2RawValues,
@@ -24,7 +17,7 @@ class ESGAnalysisLLMLogic():
         "carbon_emissions": _pydantic_models.CarbonEmissions,
         "activities_involvements": _pydantic_models.ActivitiesInvolvements,
     }
-    GENERIC_SYSTEM_TEMPLATE = DEEP_THINKING_INSTRUCTION + (
+    GENERIC_SYSTEM_TEMPLATE = (
         "As trading ESG analyst expert, your task is to generate the ESG analysis report for {stock} at the specified JSON format. "
         "Use the data (simulated for the exercice) to generate the ESG analysis of {stock} action totally filling the JSON schema described below. "
         # "The timeframe of {stock} data is {timeframe}. "
@@ -33,7 +26,7 @@ class ESGAnalysisLLMLogic():
         "Thus, You MUST RESPECT the type of JSON schema entries. "
         "Once again, the JSON schema described above is CRITICAL and MUST BE RESPECTED."
         )
-    CARBON_EMISSIONS_SYSTEM_TEMPLATE = DEEP_THINKING_INSTRUCTION + (
+    CARBON_EMISSIONS_SYSTEM_TEMPLATE = (
         "As trading ESG analyst expert, your task is to generate the ESG analysis report for {stock} at the specified JSON format. "
         "The JSON of the Year 1 Carbon Emissions raw values are provided here:\n{year-1_value_json}\n"
         "The JSON of the Year 2 Carbon Emissions raw values are provided here:\n{year-2_value_json}\n"
@@ -45,7 +38,7 @@ class ESGAnalysisLLMLogic():
         "Thus, You MUST RESPECT the type of JSON schema entries. "
         "Once again, the JSON schema described above is CRITICAL and MUST BE RESPECTED."
         )
-    TICKER_SYSTEM_TEMPLATE = DEEP_THINKING_INSTRUCTION + (
+    TICKER_SYSTEM_TEMPLATE = (
         "As trading ESG analyst expert, your task is to generate the ESG analysis report for {stock} at the specified JSON format. "
         "The JSON of the sustainability risk analysis is {sustainability_risk_json}."
         "The JSON of the exposure risk analysis is {exposure_risk_json}."
@@ -58,69 +51,15 @@ class ESGAnalysisLLMLogic():
         "Once again, the JSON schema described above is CRITICAL and MUST BE RESPECTED."
         )
 
-    def __new__(cls, *args, **kwargs):
-        retry_template = NAIVE_RETRY_WITH_ERROR_PROMPT.template.split("\n")
-        retry_template = retry_template[:-1] + ["YOU MUST RESPECT THE SCHEMA PROVIDED IN THE PROMPT."] + retry_template[-1:]
-        cls.RETRY_PROMPT_TEMPLATE = cls.DEEP_THINKING_INSTRUCTION + "\n".join(retry_template)
-        return super().__new__(cls, *args, **kwargs)
-
-    def __init__(self, stock: str = "AAPL"):
-        self.stock = stock
-        self.timers = []
-
-    def generic_output_parser(self, pydantic_model, system_prompt_template: str, input_variables: list = None, json_docs: dict = None):
-        """Generic template to generate Pydantic outputs.
-
+    def __init__(self, stock: str = "AAPL", model_params: dict = None, deep_thinking=True):
+        """
         Args:
-            pydantic_model: The Pydantic model to product the return on.
-            system_prompt_template (str): System prompt template for this LLM run.
-            input_variables (list): PromptTemplate additionnal input variables.
-            json_docs (dict): Additionnal values from documentations to pass at model invocation.
+            stock (str): Ticker of the stock to analyse.
+            model_params (dict): Additionnal parameters of the chat models, e.g. {"base_url": "http://localhost:11434"}.
+            deep_thinking (bool | dict): Whether to enable the deep thinking of the model, for every node or by node name,
+                e.g. {"CarbonEmissions": False}. The latency and token cost of every node are recorded in `reasoning_stats`.
         """
-        start_time = _time()
-        init_input_variables = ["stock"]
-        invocation = {"stock": self.stock}
-        if input_variables:
-            init_input_variables += input_variables
-        if json_docs:
-            invocation.update(json_docs)
-
-        evaluation_parser = PydanticOutputParser(pydantic_object=pydantic_model)
-
-        if isinstance(pydantic_model, _pydantic_models.TickerESGAnalysis):
-            factor = 2
-        else:
-            factor = 1
-
-        prompt_template = ChatPromptTemplate([
-            SystemMessagePromptTemplate.from_template(template=system_prompt_template),
-            HumanMessagePromptTemplate.from_template(template="{stock}"),
-            ],
-            input_variables=init_input_variables,
-            partial_variables={"format_instructions": evaluation_parser.get_format_instructions()}
-        )
-
-        error_model = ChatOllama(model=self.MODEL, num_gpu=256, num_ctx=4092 * 4 * factor, num_predict=1000 * 4 * factor)
-        retry_parser = RetryWithErrorOutputParser(
-            parser=evaluation_parser,
-            retry_chain=PromptTemplate.from_template(self.RETRY_PROMPT_TEMPLATE) | error_model | (lambda response:  response.content),
-            max_retries=15,
-        )
-
-        model = ChatOllama(model=self.MODEL, num_gpu=256, num_ctx=4092 * 2 * factor, num_predict=1000 * 2 * factor)
-        structured_model = model.with_structured_output(pydantic_model)
-        completion_chain = prompt_template | structured_model  # | RunnableLambda(lambda response: re.sub(r"<think>[\n\W\w]+</think>", "", response.content))
-        chain = RunnableParallel(
-            completion=completion_chain, prompt_value=prompt_template
-        ) | RunnableLambda(lambda response: retry_parser.parse_with_prompt(completion=response["completion"].model_dump_json(),
-                                                                           prompt_value=response["prompt_value"]))
-
-        response = chain.invoke(invocation)
-
-        self.timers.append(round(_time() - start_time, 3))
-        print("\t\t\tTime:", self.timers[-1])
-
-        return response
+        super().__init__(stock=stock, model_params=model_params, deep_thinking=deep_thinking)
 
     def carbon_emissions_components_output_parser(self, pydantic_model):
         """Generate components of 'Indicators' Pydantic output.
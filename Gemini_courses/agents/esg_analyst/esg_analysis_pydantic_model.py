@@ -101,7 +101,7 @@ class SustainabillityRiskRawValue(BaseModel):
     societal_issues_value: float = Field(alias="societal_issues_value", description="(float) Societal part of ESG risk in percentage")
     governance_issues_value: float = Field(alias="governance_issues_value", description="(float) Governance part of ESG risk in percentage")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class SustainabilityRisk(BaseModel):
@@ -115,14 +115,14 @@ class SustainabilityRisk(BaseModel):
     governance_issues_evaluation: str = Field(..., alias="governance_issues_evaluation", description="(str) Evaluation of the governance part of ESG risk")
     raw_tool_data: Optional[SustainabillityRiskRawValue] = Field(None, alias="raw_tool_data", description="Raw data specific to the ESG sustainability tool.")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class ExposureRiskRawValue(BaseModel):
     """Exposure risk raw value provided by the tool."""
     exposure_risk_value: float = Field(alias="exposure_risk_value", description="(float) ESG risk exposure of the company in percentage")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class ExposureRisk(BaseModel):
@@ -131,14 +131,14 @@ class ExposureRisk(BaseModel):
     esg_exposure_risk_level: ExposureRiskLevel = Field(..., alias="esg_exposure_risk_level", description="(enum) Level of the ESG exposure risk. Type of level: ExposureRiskLevel")
     raw_tool_data: Optional[ExposureRiskRawValue] = Field(None, alias="raw_tool_data", description="Raw data specific to the ESG exposure risk tool.")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class ManagementScoreRawValue(BaseModel):
     """Management score raw value provided by the tool."""
     management_score_value: float = Field(alias="management_score_value", description="(float) ESG risk manageable by the company")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class ManagementScore(BaseModel):
@@ -148,7 +148,7 @@ class ManagementScore(BaseModel):
                                                            description="(enum) Level of the ESG management. Type of level: ESGManagementScore")
     raw_tool_data: Optional[ManagementScoreRawValue] = Field(None, alias="raw_tool_data", description="Raw data specific to the ESG management score tool.")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 def create_carbon_year_raw_values_model(year_number: int) -> Type[BaseModel]:
@@ -172,7 +172,7 @@ def create_carbon_year_raw_values_model(year_number: int) -> Type[BaseModel]:
         "scope_1": Field(..., alias=scope_1_alias, description="(float) Greenhouse gases emitted directly by the company in tonnes of CO2."),
         "scope_2": Field(..., alias=scope_2_alias, description="(float) Indirect emissions linked to energy in tonnes of CO2."),
 
-        "model_config": ConfigDict(populate_by_name=True),
+        "model_config": ConfigDict(populate_by_name=True, defer_build=True),
     }
 
     attributes_dict["__annotations__"] = annotations
@@ -192,7 +192,7 @@ class CarbonEmissionsRawValue(BaseModel):
     year_2_value: Optional[Year2RawValues] = Field(None, alias="year_2_value", description="Carbon emissions values of 2 year ago.")
     year_3_value: Optional[Year3RawValues] = Field(None, alias="year_3_value", description="Carbon emissions values of 3 year ago.")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class CarbonEmissions(BaseModel):
@@ -203,6 +203,8 @@ class CarbonEmissions(BaseModel):
                                                               description="(enum) Level of the carbon emission risk. Type of level: CarbonEmissionsLevel")
     raw_tool_data: Optional[CarbonEmissionsRawValue] = Field(None, alias="raw_tool_data", description="Raw data specific to the carbon emissions tool.")
 
+    model_config = ConfigDict(defer_build=True)
+
 
 class ActivitiesInvolvementsRawValue(BaseModel):
     """Activities involvements raw value provided by the tool."""
@@ -212,7 +214,7 @@ class ActivitiesInvolvementsRawValue(BaseModel):
                                              description="(int) Involvements in activities with a negative impact. Notation out of 23, e.g. 1/23")
     controversies_risk_value: int = Field(alias="controversies_risk_value", description="(int) Risk linked to controversies. Notation out of 5, e.g. 2/5")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class ActivitiesInvolvements(BaseModel):
@@ -222,7 +224,7 @@ class ActivitiesInvolvements(BaseModel):
     controversies_risk_evaluation: str = Field(..., alias="controversies_risk_evaluation", description=("(str) Evaluation of involvements in controversies."))
     raw_tool_data: Optional[ActivitiesInvolvementsRawValue] = Field(None, alias="raw_tool_data", description="Raw data specific to the activities involvements tool.")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class Synthesis(BaseModel):
@@ -231,7 +233,7 @@ class Synthesis(BaseModel):
     synthesis_trading_action: TradingActions = Field(..., alias="synthesis_trading_action" , description="(enum) Action to take. Type of action: TradingActions.")
     synthesis_risk: RisksLevel = Field(..., alias="synthesis_risk", description="(enum) Risk level according to the conclusion. Type of level: RisksLevel")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class TickerESGAnalysis(BaseModel):
@@ -247,3 +249,5 @@ class TickerESGAnalysis(BaseModel):
                                                             description="(ActivitiesInvolvements) Activities involvements data.")
     synthesis: Synthesis = Field(..., alias="synthesis",
                                  description="(Synthesis) Synthesis and conslusions made on every ESG, caron emissions and activities related data.")
+
+    model_config = ConfigDict(defer_build=True)
@@ -0,0 +1,48 @@
+"""Benchmark of the cold start of the analysts modules.
+
+Every measure runs in a fresh interpreter. Run it from the `Gemini_courses` directory:
+    python -m agents.import_benchmark
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+
+BENCHMARKS = {
+    "technical pydantic models": "import agents.technical_analyst.technical_analysis_pydantic_model",
+    "esg pydantic models": "import agents.esg_analyst.esg_analysis_pydantic_model",
+    "technical LLM logic": "import agents.technical_analyst.technical_analysis_LLM_logic",
+    "esg LLM logic": "import agents.esg_analyst.esg_analysis_LLM_logic",
+    "esg LLM logic instance": ("from agents.esg_analyst.esg_analysis_LLM_logic import ESGAnalysisLLMLogic\n"
+                               "ESGAnalysisLLMLogic(stock='AAPL')"),
+}
+
+
+def measure_cold_start(statement: str, runs: int = 5) -> float:
+    """Return the median time in milliseconds of a statement run in a fresh interpreter.
+
+    Args:
+        statement (str): The Python statement to measure, e.g. an import.
+        runs (int): Number of fresh interpreters to run.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.path.dirname(root), os.environ.get("PYTHONPATH", "")]))
+    code = ("from time import perf_counter as _perf_counter\n"
+            "_start = _perf_counter()\n"
+            f"{statement}\n"
+            "print((_perf_counter() - _start) * 1000)")
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, env=environment, capture_output=True, text=True, check=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def main():
+    for name, statement in BENCHMARKS.items():
+        print(f"{name:<30} {measure_cold_start(statement):>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""Durable local job queue and worker farm for the analysts.
+
+A ticker analysis is split into node-level jobs from the `*_REQUIRED_PYDANTIC_MODELS` maps of its analyst, every
+aggregate node depending on the jobs of its children. Jobs are stored in a SQLite file, so that no external service
+is needed: workers processes of one host, or of several hosts sharing the file on a file system with working locks,
+claim the jobs whose dependencies are done with a lease renewed while they run. A job whose lease expires, e.g.
+because its worker died, is claimed again. Every worker is pinned to its model endpoint, e.g. an Ollama server.
+
+Usage, from the `Gemini_courses` directory:
+    python -m agents.job_queue submit --queue jobs.sqlite --analyst technical AAPL MSFT
+    python -m agents.job_queue worker --queue jobs.sqlite --endpoint http://localhost:11434
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from .esg_analyst import esg_analysis_LLM_logic as _esg_logic
+from .technical_analyst import technical_analysis_LLM_logic as _technical_logic
+
+
+ANALYSTS = {
+    "technical": (_technical_logic.TechnicalAnalysisLLMLogic, _technical_logic._pydantic_models),
+    "esg": (_esg_logic.ESGAnalysisLLMLogic, _esg_logic._pydantic_models),
+}
+
+
+def _model_name(pydantic_models, pydantic_model) -> str:
+    """Return the name of a Pydantic model in its module, e.g. "RSIEvaluation" for the "RsiEvaluation" class."""
+    return next(name for name, value in vars(pydantic_models).items() if value is pydantic_model)
+
+
+def plan_technical_analysis(timeframes: tuple = ("5 minutes", "1 hour")) -> list:
+    """Return the jobs of a technical analysis as (node, payload, dependencies nodes) tuples, children first.
+
+    Args:
+        timeframes (tuple): Short and long timeframes, e.g. ("5 minutes", "1 hour").
+    """
+    analyst, pydantic_models = ANALYSTS["technical"]
+    jobs = []
+    ticker_dependencies = []
+    for (timeframe_name, timeframe_model), timeframe in zip(analyst.TICKER_REQUIRED_PYDANTIC_MODELS.items(), timeframes):
+        timeframe_dependencies = []
+        for name, pydantic_model in analyst.TIMEFRAME_DATA_REQUIRED_PYDANTIC_MODELS.items():
+            node = f"{timeframe_name}.{name}"
+            if "indicators" in name:
+                indicator_dependencies = []
+                for indicator_name, indicator_model in analyst.INDICATOR_REQUIRED_PYDANTIC_MODELS.items():
+                    indicator_node = f"{node}.{indicator_name}"
+                    jobs.append((indicator_node, {"name": indicator_name, "model": _model_name(pydantic_models, indicator_model),
+                                                  "template": "GENERIC_SYSTEM_TEMPLATE", "timeframe": timeframe}, []))
+                    indicator_dependencies.append(indicator_node)
+                jobs.append((node, {"name": name, "model": _model_name(pydantic_models, pydantic_model),
+                                    "template": "INDICATORS_SYSTEM_TEMPLATE", "timeframe": timeframe}, indicator_dependencies))
+            else:
+                jobs.append((node, {"name": name, "model": _model_name(pydantic_models, pydantic_model), "template": "GENERIC_SYSTEM_TEMPLATE",
+                                    "timeframe": timeframe}, []))
+            timeframe_dependencies.append(node)
+        jobs.append((timeframe_name, {"name": timeframe_name, "model": _model_name(pydantic_models, timeframe_model),
+                                      "template": "TIMEFRAME_DATA_SYSTEM_TEMPLATE", "timeframe": timeframe}, timeframe_dependencies))
+        ticker_dependencies.append(timeframe_name)
+    jobs.append(("ticker", {"name": "ticker", "model": "TickerTechnicalAnalysis", "template": "TICKER_SYSTEM_TEMPLATE"}, ticker_dependencies))
+    return jobs
+
+
+def plan_esg_analysis() -> list:
+    """Return the jobs of an ESG analysis as (node, payload, dependencies nodes) tuples, children first."""
+    analyst, pydantic_models = ANALYSTS["esg"]
+    jobs = []
+    ticker_dependencies = []
+    for name, pydantic_model in analyst.TICKER_REQUIRED_PYDANTIC_MODELS.items():
+        if "carbon_emissions" in name:
+            carbon_dependencies = []
+            for year_name, year_model in analyst.CARBON_EMISSIONS_RAW_VALUE_PYDANTIC_MODELS.items():
+                year_node = f"{name}.{year_name}"
+                jobs.append((year_node, {"name": year_name, "model": _model_name(pydantic_models, year_model), "template": "GENERIC_SYSTEM_TEMPLATE"},
+                             []))
+                carbon_dependencies.append(year_node)
+            jobs.append((name, {"name": name, "model": _model_name(pydantic_models, pydantic_model), "template": "CARBON_EMISSIONS_SYSTEM_TEMPLATE"},
+                         carbon_dependencies))
+        else:
+            jobs.append((name, {"name": name, "model": _model_name(pydantic_models, pydantic_model), "template": "GENERIC_SYSTEM_TEMPLATE"}, []))
+        ticker_dependencies.append(name)
+    jobs.append(("ticker", {"name": "ticker", "model": "TickerESGAnalysis", "template": "TICKER_SYSTEM_TEMPLATE"}, ticker_dependencies))
+    return jobs
+
+
+PLANS = {
+    "technical": plan_technical_analysis,
+    "esg": plan_esg_analysis,
+}
+
+
+class JobQueue():
+    """Durable queue of the analyses node-level jobs stored in a SQLite file."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS analyses (id INTEGER PRIMARY KEY, analyst TEXT NOT NULL, stock TEXT NOT NULL, created REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, analysis_id INTEGER NOT NULL, node TEXT NOT NULL, payload TEXT NOT NULL, "
+        "status TEXT NOT NULL DEFAULT 'pending', worker TEXT, lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT)",
+        "CREATE TABLE IF NOT EXISTS dependencies (job_id INTEGER NOT NULL, dependency_id INTEGER NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, analysis_id, id)",
+        "CREATE INDEX IF NOT EXISTS dependencies_job ON dependencies (job_id)",
+    )
+    READY_JOB_QUERY = (
+        "SELECT jobs.id, jobs.analysis_id, jobs.node, jobs.payload, analyses.analyst, analyses.stock FROM jobs "
+        "JOIN analyses ON analyses.id = jobs.analysis_id "
+        "WHERE (jobs.status = 'pending' OR (jobs.status = 'leased' AND jobs.lease_until < ?)) AND jobs.attempts < ? "
+        "AND NOT EXISTS (SELECT 1 FROM dependencies JOIN jobs AS dependency ON dependency.id = dependencies.dependency_id "
+        "WHERE dependencies.job_id = jobs.id AND dependency.status != 'done') "
+        "ORDER BY jobs.analysis_id, jobs.id LIMIT 1"
+    )
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        """
+        Args:
+            path (str): Path of the SQLite file.
+            max_attempts (int): Maximum number of attempts of a job before it fails, the attempts whose worker was lost
+                (killed, out of memory) with its lease expired included.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        with self._transaction() as connection:
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+
+    def _connection(self):
+        """Return the connection of the current thread, SQLite connections can not be shared between threads."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def _transaction(self):
+        """Return a context manager running its block in an immediate transaction."""
+        queue = self
+
+        class _Transaction():
+            def __enter__(self):
+                self.connection = queue._connection()
+                self.connection.execute("BEGIN IMMEDIATE")
+                return self.connection
+
+            def __exit__(self, exception_type, exception, traceback):
+                self.connection.execute("ROLLBACK" if exception_type else "COMMIT")
+
+        return _Transaction()
+
+    def submit(self, analyst: str, stock: str, **plan_options) -> int:
+        """Split a ticker analysis into node-level jobs, queue them and return the analysis id.
+
+        Args:
+            analyst (str): Name of the analyst, "technical" or "esg".
+            stock (str): Ticker of the stock to analyse.
+            plan_options: Options of the analyst plan, e.g. timeframes=("5 minutes", "1 hour").
+        """
+        jobs = PLANS[analyst](**plan_options)
+        with self._transaction() as connection:
+            analysis_id = connection.execute("INSERT INTO analyses (analyst, stock, created) VALUES (?, ?, ?)",
+                                             (analyst, stock, time.time())).lastrowid
+            job_ids = {}
+            for node, payload, dependencies in jobs:
+                job_ids[node] = connection.execute("INSERT INTO jobs (analysis_id, node, payload) VALUES (?, ?, ?)",
+                                                   (analysis_id, node, json.dumps(payload))).lastrowid
+                connection.executemany("INSERT INTO dependencies (job_id, dependency_id) VALUES (?, ?)",
+                                       [(job_ids[node], job_ids[dependency]) for dependency in dependencies])
+        return analysis_id
+
+    def claim(self, worker: str, lease_seconds: float = 600):
+        """Lease the next job whose dependencies are done and return it as a dict, or None if no job is ready.
+
+        Args:
+            worker (str): Identifier of the worker.
+            lease_seconds (float): Duration of the lease, the job is claimable again once expired.
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            self._fail_expired(connection, now)
+            row = connection.execute(self.READY_JOB_QUERY, (now, self.max_attempts)).fetchone()
+            if row is None:
+                return None
+            job_id, analysis_id, node, payload, analyst, stock = row
+            connection.execute("UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                               (worker, now + lease_seconds, job_id))
+            dependencies = connection.execute(
+                "SELECT jobs.payload, jobs.result FROM dependencies JOIN jobs ON jobs.id = dependencies.dependency_id "
+                "WHERE dependencies.job_id = ? ORDER BY jobs.id", (job_id,)).fetchall()
+        return {"id": job_id, "analysis_id": analysis_id, "node": node, "payload": json.loads(payload), "analyst": analyst, "stock": stock,
+                "dependencies": [(json.loads(dependency_payload), result) for dependency_payload, result in dependencies]}
+
+    def _fail_expired(self, connection, now: float):
+        """Fail the jobs whose lease expired at their last attempt, their worker having been lost."""
+        connection.execute("UPDATE jobs SET status = 'failed', lease_until = NULL, "
+                           "error = 'Lease of worker ' || worker || ' expired at attempt ' || attempts || ', the worker was lost.' "
+                           "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?", (now, self.max_attempts))
+        self._cancel_failed(connection, now)
+
+    @staticmethod
+    def _cancel_failed(connection, now: float):
+        """Cancel the jobs waiting to run in the analyses with a failed job, their report can not be generated anymore."""
+        connection.execute("UPDATE jobs SET status = 'cancelled', lease_until = NULL WHERE (status = 'pending' OR (status = 'leased' "
+                           "AND lease_until < ?)) AND analysis_id IN (SELECT analysis_id FROM jobs WHERE status = 'failed')", (now,))
+
+    def active_jobs(self) -> int:
+        """Return the number of jobs pending or running, the jobs of the failed analyses being cancelled first."""
+        with self._transaction() as connection:
+            self._fail_expired(connection, time.time())
+            return connection.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'leased')").fetchone()[0]
+
+    def renew(self, job_id: int, worker: str, lease_seconds: float = 600) -> bool:
+        """Extend the lease of a running job, return False if the worker lost it."""
+        with self._transaction() as connection:
+            return connection.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                                      (time.time() + lease_seconds, job_id, worker)).rowcount == 1
+
+    def complete(self, job_id: int, worker: str, result: str) -> bool:
+        """Store the JSON result of a job, return False if the worker lost its lease."""
+        with self._transaction() as connection:
+            return connection.execute("UPDATE jobs SET status = 'done', result = ?, lease_until = NULL WHERE id = ? AND worker = ? "
+                                      "AND status = 'leased'", (result, job_id, worker)).rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error: str):
+        """Release a job after an error, it fails definitely after `max_attempts` attempts, cancelling the rest of its analysis."""
+        with self._transaction() as connection:
+            connection.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?, "
+                               "lease_until = NULL WHERE id = ? AND worker = ?", (self.max_attempts, error, job_id, worker))
+            self._cancel_failed(connection, time.time())
+
+    def status(self, analysis_id: int) -> dict:
+        """Return the number of jobs of an analysis by status."""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs WHERE analysis_id = ? GROUP BY status", (analysis_id,)).fetchall()
+        return dict(rows)
+
+    def results(self, analysis_id: int) -> dict:
+        """Return the JSON results of the done jobs of an analysis by node, in the order of the analysis plan."""
+        rows = self._connection().execute("SELECT node, result FROM jobs WHERE analysis_id = ? AND status = 'done' ORDER BY id",
+                                          (analysis_id,)).fetchall()
+        return dict(rows)
+
+    def wait(self, analysis_id: int, timeout: float = None, poll_interval: float = 1.0):
+        """Wait for an analysis and return its report as Pydantic model.
+
+        Args:
+            analysis_id (int): Identifier of the analysis returned by `submit`.
+            timeout (float): Maximum time to wait in seconds, no limit by default.
+            poll_interval (float): Time between two checks in seconds.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            with self._transaction() as connection:
+                self._fail_expired(connection, time.time())
+            row = connection.execute("SELECT jobs.status, jobs.result, jobs.payload, analyses.analyst FROM jobs "
+                                     "JOIN analyses ON analyses.id = jobs.analysis_id WHERE jobs.analysis_id = ? AND jobs.node = 'ticker'",
+                                     (analysis_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Unknown analysis {analysis_id}.")
+            status, result, payload, analyst = row
+            if status == "done":
+                return getattr(ANALYSTS[analyst][1], json.loads(payload)["model"]).model_validate_json(result)
+            failed = connection.execute("SELECT node, error FROM jobs WHERE analysis_id = ? AND status = 'failed'", (analysis_id,)).fetchone()
+            if failed:
+                raise RuntimeError(f"Job '{failed[0]}' of analysis {analysis_id} failed: {failed[1]}")
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError(f"Analysis {analysis_id} is not done after {timeout} seconds: {self.status(analysis_id)}")
+            time.sleep(poll_interval)
+
+
+class Worker():
+    """Worker running the jobs of a queue with the chat models of its endpoint."""
+
+    def __init__(self, queue: JobQueue, endpoint: str = None, worker_id: str = None, lease_seconds: float = 600, poll_interval: float = 1.0):
+        """
+        Args:
+            queue (JobQueue): The job queue.
+            endpoint (str): URL of the model server of the worker, e.g. "http://localhost:11434", the default one if None.
+            worker_id (str): Identifier of the worker, the host, process and a random suffix by default.
+            lease_seconds (float): Duration of the job leases, renewed every third of it while the job runs.
+            poll_interval (float): Time between two claims in seconds when no job is ready.
+        """
+        self.queue = queue
+        self.endpoint = endpoint
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+    def execute(self, job: dict) -> str:
+        """Run a job with its analyst and return its JSON result."""
+        analyst_class, pydantic_models = ANALYSTS[job["analyst"]]
+        analyst = analyst_class(stock=job["stock"], model_params={"base_url": self.endpoint} if self.endpoint else None)
+        payload = job["payload"]
+        json_docs = {}
+        for dependency_payload, result in job["dependencies"]:
+            dependency_model = getattr(pydantic_models, dependency_payload["model"])
+            json_docs[dependency_payload["name"] + "_json"] = dependency_model.model_validate_json(result)
+        parser_arguments = {"timeframe": payload["timeframe"]} if payload.get("timeframe") else {}
+        response = analyst.generic_output_parser(pydantic_model=getattr(pydantic_models, payload["model"]),
+                                                 system_prompt_template=getattr(analyst, payload["template"]),
+                                                 input_variables=list(json_docs.keys()) or None, json_docs=json_docs or None, **parser_arguments)
+        return response.model_dump_json(by_alias=True)
+
+    def run_once(self) -> bool:
+        """Claim and run one job, return False if no job was ready."""
+        job = self.queue.claim(self.worker_id, lease_seconds=self.lease_seconds)
+        if job is None:
+            return False
+
+        stop_renewal = threading.Event()
+
+        def _renew():
+            while not stop_renewal.wait(self.lease_seconds / 3):
+                if not self.queue.renew(job["id"], self.worker_id, lease_seconds=self.lease_seconds):
+                    return
+
+        renewal = threading.Thread(target=_renew, daemon=True)
+        renewal.start()
+        try:
+            result = self.execute(job)
+        except Exception as error:
+            self.queue.fail(job["id"], self.worker_id, repr(error))
+        else:
+            self.queue.complete(job["id"], self.worker_id, result)
+        finally:
+            stop_renewal.set()
+            renewal.join()
+        return True
+
+    def run(self, stop_when_idle: bool = False):
+        """Run the jobs of the queue until interrupted, or until no job is pending or running if `stop_when_idle`.
+
+        A job not ready yet, waiting for the jobs of other workers, keeps the worker polling.
+        """
+        while True:
+            if not self.run_once():
+                if stop_when_idle and not self.queue.active_jobs():
+                    return
+                time.sleep(self.poll_interval)
+
+
+def _run_worker(queue_path: str, endpoint: str, stop_when_idle: bool):
+    Worker(JobQueue(queue_path), endpoint=endpoint).run(stop_when_idle=stop_when_idle)
+
+
+def run_workers(queue_path: str, endpoints: list, workers_per_endpoint: int = 1, stop_when_idle: bool = True):
+    """Run worker processes pinned to model endpoints and wait for them.
+
+    Args:
+        queue_path (str): Path of the SQLite file of the queue.
+        endpoints (list): URLs of the model servers, e.g. ["http://localhost:11434", "http://gpu-2:11434"].
+        workers_per_endpoint (int): Number of worker processes per model server.
+        stop_when_idle (bool): Whether the workers stop once no job is pending or running.
+    """
+    import multiprocessing
+
+    processes = [multiprocessing.Process(target=_run_worker, args=(queue_path, endpoint, stop_when_idle))
+                 for endpoint in endpoints for _ in range(workers_per_endpoint)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Durable job queue of the analysts.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    submit_parser = subparsers.add_parser("submit", help="Queue the analyses of stocks.")
+    submit_parser.add_argument("--queue", required=True, help="Path of the SQLite file of the queue.")
+    submit_parser.add_argument("--analyst", choices=list(PLANS), default="technical")
+    submit_parser.add_argument("stocks", nargs="+")
+    worker_parser = subparsers.add_parser("worker", help="Run workers pinned to model endpoints.")
+    worker_parser.add_argument("--queue", required=True, help="Path of the SQLite file of the queue.")
+    worker_parser.add_argument("--endpoint", action="append", default=None, help="URL of a model server, repeatable.")
+    worker_parser.add_argument("--workers-per-endpoint", type=int, default=1)
+    worker_parser.add_argument("--stop-when-idle", action="store_true")
+    arguments = parser.parse_args()
+
+    if arguments.command == "submit":
+        queue = JobQueue(arguments.queue)
+        for stock in arguments.stocks:
+            print(stock, queue.submit(arguments.analyst, stock))
+    else:
+        run_workers(arguments.queue, arguments.endpoint or [None], workers_per_endpoint=arguments.workers_per_endpoint,
+                    stop_when_idle=arguments.stop_when_idle)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+from . import news_analysis_pydantic_model as _pydantic_models
+import json
+
+from custom_features.analyst_logic import AnalystLLMLogic
+
+
+class NewsAnalysisLLMLogic(AnalystLLMLogic):
+
+    STORIES_SYSTEM_TEMPLATE = (
+        "As financial news analyst expert, your task is to rate the emotions raised by news stories about {stock} at the specified JSON format. "
+        "Rate every story with the percentages of anger, fear, bad feeling, surprise, happiness and sadness it raises for an investor "
+        "in the listed companies, the percentages of a story summing to 100. "
+        "The JSON of the stories, with their identifier and the tickers of the companies concerned, is provided here:\n{stories_json}\n"
+        "You MUST RATE EVERY STORY ONCE, with its identifier as given above. "
+        "The format of your response is CRITICAL and MUST ADHERE EXACTLY to the JSON schema described here:"
+        "\n{format_instructions}\n"
+        "Thus, You MUST RESPECT the type of JSON schema entries. "
+        "Once again, the JSON schema described above is CRITICAL and MUST BE RESPECTED."
+        )
+
+    def __init__(self, stock: str = "the companies", model_params: dict = None, deep_thinking=False, max_story_length: int = 2000,
+                 max_attempts: int = 3):
+        """
+        Args:
+            stock (str): Companies of the stories when a batch does not list their tickers.
+            model_params (dict): Additionnal parameters of the chat models, e.g. {"base_url": "http://localhost:11434"}.
+            deep_thinking (bool | dict): Whether to enable the deep thinking of the model, for every node or by node name,
+                e.g. {"NewsScoresBatch": True}. The latency and token cost of every node are recorded in `reasoning_stats`.
+            max_story_length (int): Number of characters of a story kept in the prompt, so that the batches fit in the context.
+            max_attempts (int): Number of calls made for a batch, the stories left unrated being asked again.
+        """
+        super().__init__(stock=stock, model_params=model_params, deep_thinking=deep_thinking)
+        self.max_story_length = max_story_length
+        self.max_attempts = max_attempts
+
+    def stories_output_parser(self, stories: list) -> dict:
+        """Rate a batch of stories in a single LLM run, return the NewsScore of every story by story id.
+
+        The stories left unrated by a run are asked again, up to `max_attempts` runs, and are missing from the result afterwards.
+
+        Args:
+            stories (list): Stories as dictionaries with their "story_id", "text" and optional "tickers".
+        """
+        scores = {}
+        pending = {story["story_id"]: story for story in stories}
+        for attempt in range(self.max_attempts):
+            if not pending:
+                break
+            print(f"\t\tNews stories: rating {len(pending)} stories (attempt {attempt + 1}).")
+            batch = [{"story_id": story_id, "tickers": sorted(story.get("tickers", ())), "text": story["text"][:self.max_story_length]}
+                     for story_id, story in pending.items()]
+            tickers = sorted({ticker for story in batch for ticker in story["tickers"]})
+            # About 4 characters per token: the base context holds about 16000 characters of stories besides the instructions and ratings.
+            factor = 1 + sum(len(story["text"]) for story in batch) // 16000
+            response = self.generic_output_parser(
+                pydantic_model=_pydantic_models.NewsScoresBatch,
+                system_prompt_template=self.STORIES_SYSTEM_TEMPLATE,
+                input_variables=["stories_json"],
+                json_docs={"stories_json": json.dumps(batch, ensure_ascii=False)},
+                stock=", ".join(tickers) if tickers else None,
+                factor=factor,
+            )
+            for score in response.scores:
+                if score.story_id in pending:
+                    del pending[score.story_id]
+                    scores[score.story_id] = _pydantic_models.NewsScore.model_validate(score.model_dump(exclude={"story_id"}))
+        if pending:
+            print(f"\t\tNews stories: {len(pending)} stories left unrated after {self.max_attempts} attempts.")
+        return scores
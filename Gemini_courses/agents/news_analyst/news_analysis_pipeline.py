@@ -0,0 +1,198 @@
+"""Streaming news sentiment pipeline.
+
+The articles of the feed are clustered into stories by near-duplicate detection, so that a burst of articles relaying
+the same story costs a single rating. The new stories are rated by batches in a single LLM run, and the rating of a
+story is folded into the time-decayed news score of every ticker it concerns, in constant time per story.
+"""
+from datetime import datetime, timezone
+from time import time as _time
+
+import numpy as np
+
+from . import news_analysis_pydantic_model as _pydantic_models
+from .news_deduplication import NearDuplicateIndex
+
+
+def timestamp(value) -> float:
+    """Return the timestamp of a datetime, ISO 8601 string or timestamp, now if None."""
+    if value is None:
+        return _time()
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class DecayedNewsScore():
+    """Time-decayed average of the ratings of the stories of a ticker.
+
+    The weight of a story halves every `half_life` seconds before the most recent story. The weighted sums are
+    rescaled when a more recent story comes in, so that an update costs the same whatever the number of stories.
+    """
+
+    def __init__(self, half_life: float):
+        """
+        Args:
+            half_life (float): Time in seconds after which the weight of a story is halved.
+        """
+        self.half_life = half_life
+        self.sums = np.zeros(len(_pydantic_models.EMOTIONS))
+        self.weight = 0.0
+        self.time = None
+        self.last_score = None
+        self.last_time = None
+        self.stories = 0
+
+    def add(self, score, time: float):
+        """Fold the rating of a story into the average.
+
+        Args:
+            score (NewsScore): Rating of the story.
+            time (float): Timestamp of the story.
+        """
+        values = np.array([getattr(score, emotion) for emotion in _pydantic_models.EMOTIONS], dtype=float)
+        if self.time is None or time >= self.time:
+            if self.time is not None:
+                decay = 0.5 ** ((time - self.time) / self.half_life)
+                self.sums *= decay
+                self.weight *= decay
+            self.time = time
+            factor = 1.0
+        else:
+            factor = 0.5 ** ((self.time - time) / self.half_life)
+        self.sums += factor * values
+        self.weight += factor
+        self.stories += 1
+        if self.last_time is None or time >= self.last_time:
+            self.last_score, self.last_time = score, time
+
+    def score(self):
+        """Return the average rating as a NewsScore, None before the first story."""
+        if not self.weight:
+            return None
+        values = _pydantic_models.percentages(list(self.sums / self.sums.sum()))
+        return _pydantic_models.NewsScore(**dict(zip(_pydantic_models.EMOTIONS, values)))
+
+
+class NewsPipeline():
+    """Ingest a news feed, rate every unique story once by batches and keep the news score of every ticker up to date."""
+
+    def __init__(self, scorer=None, index: NearDuplicateIndex = None, batch_size: int = 16, max_delay: float = None,
+                 half_life: float = 6 * 3600):
+        """
+        Args:
+            scorer: Function rating a list of stories, as dictionaries with their "story_id", "text" and "tickers", returning
+                their NewsScore by story id, a `NewsAnalysisLLMLogic().stories_output_parser` if None.
+            index (NearDuplicateIndex): Near-duplicate index of the stories, a default one if None.
+            batch_size (int): Number of new stories rated in a single LLM run.
+            max_delay (float): Time in seconds after which the pending stories are rated even if the batch is not full,
+                checked at every ingestion, no limit if None.
+            half_life (float): Time in seconds after which the weight of a story in the global news score is halved.
+        """
+        if scorer is None:
+            from .news_analysis_LLM_logic import NewsAnalysisLLMLogic
+
+            scorer = NewsAnalysisLLMLogic().stories_output_parser
+        self.scorer = scorer
+        self.index = index or NearDuplicateIndex()
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.half_life = half_life
+        self.companies = {}
+        self.scores = {}
+        self.articles = {}
+        self._stories = {}
+        self._pending = []
+        self._pending_since = None
+
+    def ingest(self, article: dict) -> int:
+        """Ingest an article and return its story id, the pending stories being rated when the batch is full.
+
+        Args:
+            article (dict): Article with its "ticker", "text" or "title" and "body", optional "time" (datetime, ISO 8601
+                string or timestamp, now if missing), "name" and "isin" of the company.
+        """
+        ticker = article["ticker"]
+        text = article.get("text") or "\n".join(filter(None, (article.get("title"), article.get("body"))))
+        time = timestamp(article.get("time"))
+        company = self.companies.setdefault(ticker, {"name": ticker, "isin": None})
+        company["name"] = article.get("name") or company["name"]
+        company["isin"] = article.get("isin") or company["isin"]
+        self.articles[ticker] = self.articles.get(ticker, 0) + 1
+
+        story_id, is_new = self.index.add(text, time)
+        if is_new:
+            self._stories[story_id] = {"story_id": story_id, "text": text, "time": time, "tickers": {ticker}, "score": None}
+            self._pending.append(story_id)
+            if self._pending_since is None:
+                self._pending_since = _time()
+        else:
+            story = self._stories.get(story_id)
+            if story is not None and ticker not in story["tickers"]:
+                story["tickers"].add(ticker)
+                # A story already rated is folded into the score of the new ticker, a pending one will be at its rating.
+                if story["score"] is not None:
+                    self._score(ticker).add(story["score"], story["time"])
+
+        if len(self._pending) >= self.batch_size or (
+                self.max_delay is not None and self._pending and _time() - self._pending_since >= self.max_delay):
+            self.flush()
+        return story_id
+
+    def ingest_stream(self, articles) -> dict:
+        """Ingest an iterable of articles, rate the pending stories and return the reports of the tickers."""
+        for article in articles:
+            self.ingest(article)
+        self.flush()
+        return self.reports()
+
+    def flush(self) -> int:
+        """Rate the pending stories by batches, return the number of stories rated."""
+        rated = 0
+        while self._pending:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            scores = self.scorer([self._stories[story_id] for story_id in batch])
+            for story_id in batch:
+                story = self._stories[story_id]
+                story["score"] = scores.get(story_id)
+                if story["score"] is None:
+                    continue
+                rated += 1
+                for ticker in story["tickers"]:
+                    self._score(ticker).add(story["score"], story["time"])
+        self._pending_since = None
+        self._forget()
+        return rated
+
+    def _score(self, ticker: str) -> DecayedNewsScore:
+        if ticker not in self.scores:
+            self.scores[ticker] = DecayedNewsScore(self.half_life)
+        return self.scores[ticker]
+
+    def _forget(self):
+        # The stories expired from the index can no longer get duplicates, their ratings live on in the ticker scores only.
+        for story_id in [story_id for story_id in self._stories if story_id not in self.index.signatures]:
+            del self._stories[story_id]
+
+    def report(self, ticker: str):
+        """Return the TickerNewsAnalysis of a ticker, None before the rating of its first story."""
+        score = self.scores.get(ticker)
+        if score is None or score.last_score is None:
+            return None
+        company = self.companies[ticker]
+        return _pydantic_models.TickerNewsAnalysis(
+            name_of_the_company=company["name"],
+            isin_of_the_company=company["isin"],
+            time_of_the_report=datetime.now(),
+            last_news_score=score.last_score,
+            global_news_score=score.score(),
+            number_of_stories=score.stories,
+            number_of_articles=self.articles.get(ticker, 0),
+        )
+
+    def reports(self) -> dict:
+        """Return the TickerNewsAnalysis of every ticker with a rated story, by ticker."""
+        return {ticker: report for ticker in self.scores if (report := self.report(ticker)) is not None}
@@ -0,0 +1,65 @@
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import Optional, List
+from datetime import datetime
+
+
+EMOTIONS = ("angry", "fearful", "bad", "surprised", "happy", "sad")
+
+
+class NewsScore(BaseModel):
+    """Emotional notation of news based on the feeling wheel, in percentages summing to 100."""
+    angry: int = Field(..., alias="angry", ge=0, le=100, description="(int) Percentage of anger raised by the news.")
+    fearful: int = Field(..., alias="fearful", ge=0, le=100, description="(int) Percentage of fear raised by the news.")
+    bad: int = Field(..., alias="bad", ge=0, le=100, description="(int) Percentage of bad feeling raised by the news.")
+    surprised: int = Field(..., alias="surprised", ge=0, le=100, description="(int) Percentage of surprise raised by the news.")
+    happy: int = Field(..., alias="happy", ge=0, le=100, description="(int) Percentage of happiness raised by the news.")
+    sad: int = Field(..., alias="sad", ge=0, le=100, description="(int) Percentage of sadness raised by the news.")
+
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
+
+    @model_validator(mode="after")
+    def normalize(self):
+        """Rescale the percentages so that they sum to 100, with the largest remainder method."""
+        values = [getattr(self, emotion) for emotion in EMOTIONS]
+        total = sum(values)
+        if total == 0:
+            raise ValueError("At least one emotion percentage must be positive.")
+        if total != 100:
+            for emotion, value in zip(EMOTIONS, percentages([value / total for value in values])):
+                object.__setattr__(self, emotion, value)
+        return self
+
+
+def percentages(weights: list) -> list:
+    """Return integer percentages of weights summing to 1, summing to 100 with the largest remainder method."""
+    raw = [weight * 100 for weight in weights]
+    values = [int(value) for value in raw]
+    for index in sorted(range(len(raw)), key=lambda index: values[index] - raw[index])[:100 - sum(values)]:
+        values[index] += 1
+    return values
+
+
+class StoryNewsScore(NewsScore):
+    """Emotional notation of a news story."""
+    story_id: int = Field(..., alias="story_id", description="(int) Identifier of the story as given in the prompt.")
+
+
+class NewsScoresBatch(BaseModel):
+    """Emotional notations of a batch of news stories."""
+    scores: List[StoryNewsScore] = Field(..., alias="scores", description="(list) Emotional notation of every story, one per story identifier.")
+
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
+
+
+class TickerNewsAnalysis(BaseModel):
+    """Ticker news analysis: emotional notation of the last story and time-decayed notation of every story."""
+    name_of_the_company: str = Field(..., alias="name_of_the_company", description="(str) Name of the company.")
+    isin_of_the_company: Optional[str] = Field(None, alias="isin_of_the_company", description="(str) ISIN code of the company.")
+    time_of_the_report: datetime = Field(..., alias="time_of_the_report", description="(str) datetime of the current report.")
+    last_news_score: NewsScore = Field(..., alias="last_news_score", description="(NewsScore) Emotional notation of the last story.")
+    global_news_score: NewsScore = Field(..., alias="global_news_score",
+                                         description="(NewsScore) Emotional notation of every story, weighted by the time decay of the stories.")
+    number_of_stories: int = Field(..., alias="number_of_stories", description="(int) Number of unique stories scored.")
+    number_of_articles: int = Field(..., alias="number_of_articles", description="(int) Number of articles, near-duplicates included.")
+
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
@@ -0,0 +1,109 @@
+"""Near-duplicate detection of the news articles with MinHash and locality sensitive hashing (LSH).
+
+The same wire story is published by many sources with small edits. Every article is reduced to the set of its word
+shingles, whose MinHash signature estimates the Jaccard similarity between articles. The signatures are split into
+bands indexed in hash tables, so that the candidate duplicates of an article are found in constant time: two
+articles share a band with a probability of 1 - (1 - s^rows)^bands for a similarity s.
+"""
+import re
+import zlib
+from collections import deque
+
+import numpy as np
+
+
+# Mersenne prime of the universal hash functions, the hashes are below 2^31 so that their products fit in 64 bits.
+_PRIME = (1 << 31) - 1
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """Return the hashes of the word shingles of a text."""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        words = words + [""] * (size - len(words))
+    return {zlib.crc32(" ".join(words[index:index + size]).encode()) & _PRIME for index in range(len(words) - size + 1)}
+
+
+class NearDuplicateIndex():
+    """MinHash LSH index clustering the near-duplicate stories over a sliding time window."""
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, threshold: float = 0.7, shingle_size: int = 3, window: float = 2 * 24 * 3600,
+                 seed: int = 1):
+        """
+        Args:
+            num_perm (int): Number of hash functions of the MinHash signatures.
+            bands (int): Number of LSH bands, `num_perm` must be a multiple of it.
+            threshold (float): Estimated Jaccard similarity above which two articles are the same story.
+            shingle_size (int): Number of words of the shingles.
+            window (float): Time in seconds after which a story is forgotten, so that the index memory is bounded.
+            seed (int): Seed of the hash functions.
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm={num_perm} is not a multiple of bands={bands}.")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.window = window
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = generator.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._tables = [{} for _ in range(bands)]
+        self.signatures = {}
+        self._history = deque()
+        self._next_id = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """Return the MinHash signature of a text."""
+        hashes = np.fromiter(shingles(text, self.shingle_size), dtype=np.uint64)
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def similarity(self, first: np.ndarray, second: np.ndarray) -> float:
+        """Return the Jaccard similarity estimated from two signatures."""
+        return float(np.mean(first == second))
+
+    def expire(self, now: float):
+        """Forget the stories older than the window."""
+        while self._history and self._history[0][0] < now - self.window:
+            _, story_id, keys = self._history.popleft()
+            self.signatures.pop(story_id, None)
+            for table, key in zip(self._tables, keys):
+                stories = table.get(key)
+                if stories is not None:
+                    stories.discard(story_id)
+                    if not stories:
+                        del table[key]
+
+    def add(self, text: str, time: float) -> tuple:
+        """Add an article and return its (story id, whether the story is new).
+
+        Args:
+            text (str): Text of the article, e.g. its title and body.
+            time (float): Timestamp of the article.
+        """
+        self.expire(time)
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        candidates = set()
+        for table, key in zip(self._tables, keys):
+            candidates.update(table.get(key, ()))
+        best, best_similarity = None, self.threshold
+        for story_id in candidates:
+            similarity = self.similarity(signature, self.signatures[story_id])
+            if similarity >= best_similarity:
+                best, best_similarity = story_id, similarity
+        if best is not None:
+            return best, False
+
+        story_id = self._next_id
+        self._next_id += 1
+        self.signatures[story_id] = signature
+        for table, key in zip(self._tables, keys):
+            table.setdefault(key, set()).add(story_id)
+        self._history.append((time, story_id, keys))
+        return story_id, True
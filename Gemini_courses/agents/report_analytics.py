@@ -0,0 +1,294 @@
+"""Time-indexed analytics over accumulated analysts reports.
+
+The enum and numeric fields of the reports are projected into columnar numpy arrays named after their path
+in the report, e.g. "long_timeframe_data.long_timeframe_data_synthesis.synthese_trading_action":
+- enum columns store the index of the value in the enum (-1 for None) with a bitmap index per value,
+- numeric columns store floats (NaN for None).
+Every report row also keeps its ticker ISIN and time, with a time-sorted index of rows per ticker.
+
+Filters combine the bitmap indexes, transitions compare the consecutive reports of each ticker, e.g.:
+    analytics.transitions("long_timeframe_data_synthesis.synthese_trading_action", "HOLD", "BUY", start=monday)
+    analytics.filter({"supports_evaluation.interaction_status": "BREAKING_BELOW_SUPPORT"})
+The conditions of a filter are combined with AND, but a column suffix matching several columns, as the support
+status above which exists for every timeframe, matches the rows where any of these columns matches.
+"""
+from datetime import datetime
+from enum import Enum
+from typing import Union, get_args, get_origin
+
+import numpy as np
+from pydantic import BaseModel
+
+
+class ReportAnalytics():
+    """Columnar projection of the reports of a Pydantic model with per-ticker time indexes and bitmap indexes."""
+
+    def __init__(self, report_model, capacity: int = 1024):
+        """
+        Args:
+            report_model: The Pydantic model of the reports, e.g. TickerTechnicalAnalysis.
+            capacity (int): Initial number of rows allocated, doubled when full.
+        """
+        self.report_model = report_model
+        self.enum_columns = {}
+        self.numeric_columns = []
+        self._collect_columns(report_model, ())
+        self.size = 0
+        self.capacity = 0
+        self.timestamps = np.empty(0, dtype=np.float64)
+        self.tickers = np.empty(0, dtype=np.int32)
+        self.ticker_ids = {}
+        self.ticker_names = []
+        self.ticker_rows = {}
+        self._unsorted_tickers = set()
+        self.codes = {}
+        self.values = {}
+        self.bitmaps = {}
+        self._reserve(capacity)
+
+    @staticmethod
+    def _unwrap(annotation):
+        """Return the annotation without its Optional."""
+        if get_origin(annotation) is Union:
+            arguments = [argument for argument in get_args(annotation) if argument is not type(None)]
+            if len(arguments) == 1:
+                return arguments[0]
+        return annotation
+
+    def _collect_columns(self, model, path: tuple):
+        """Collect the paths of the enum and numeric fields of a model."""
+        for name, field in model.model_fields.items():
+            annotation = self._unwrap(field.annotation)
+            field_path = path + (name,)
+            if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+                self._collect_columns(annotation, field_path)
+            elif isinstance(annotation, type) and issubclass(annotation, Enum):
+                self.enum_columns[".".join(field_path)] = list(annotation)
+            elif annotation in (int, float):
+                self.numeric_columns.append(".".join(field_path))
+
+    @property
+    def columns(self) -> list:
+        """Return the names of the enum and numeric columns."""
+        return list(self.enum_columns) + self.numeric_columns
+
+    def matching_columns(self, name: str) -> list:
+        """Return the full names of the columns matching a full name or a suffix of it.
+
+        Args:
+            name (str): Name of the column, e.g. "supports_evaluation.interaction_status".
+        """
+        if name in self.enum_columns or name in self.numeric_columns:
+            return [name]
+        matches = [column for column in self.columns if column.endswith("." + name)]
+        if not matches:
+            raise ValueError(f"Column '{name}' matches no column.")
+        return matches
+
+    def resolve_column(self, name: str) -> str:
+        """Return the full name of a column from its full name or an unambiguous suffix of it.
+
+        Args:
+            name (str): Name of the column, e.g. "long_timeframe_data_synthesis.synthese_trading_action".
+        """
+        matches = self.matching_columns(name)
+        if len(matches) != 1:
+            raise ValueError(f"Column '{name}' matches {len(matches)} columns: {matches}")
+        return matches[0]
+
+    def _code(self, column: str, value) -> int:
+        """Return the code of an enum value, given as enum member, value or name."""
+        members = self.enum_columns[column]
+        for code, member in enumerate(members):
+            if value is member or value == member.value or value == member.name:
+                return code
+        raise ValueError(f"'{value}' is not a value of column '{column}': {[member.value for member in members]}")
+
+    def _reserve(self, capacity: int):
+        """Grow the arrays to hold at least `capacity` rows."""
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, self.capacity * 2)
+
+        def _grow(array, fill):
+            grown = np.full(capacity, fill, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            return grown
+
+        self.timestamps = _grow(self.timestamps, np.nan)
+        self.tickers = _grow(self.tickers, -1)
+        for column in self.enum_columns:
+            self.codes[column] = _grow(self.codes.get(column, np.empty(0, dtype=np.int8)), -1)
+        for column in self.numeric_columns:
+            self.values[column] = _grow(self.values.get(column, np.empty(0, dtype=np.float64)), np.nan)
+        for key, bitmap in self.bitmaps.items():
+            grown = np.zeros((capacity + 7) // 8, dtype=np.uint8)
+            grown[:len(bitmap)] = bitmap
+            self.bitmaps[key] = grown
+        self.capacity = capacity
+
+    @staticmethod
+    def _get(report, path: str):
+        value = report
+        for name in path.split("."):
+            value = getattr(value, name)
+            if value is None:
+                return None
+        return value
+
+    def append(self, report) -> int:
+        """Project a report into the columns and return its row.
+
+        Args:
+            report: The report, an instance of the analytics Pydantic model.
+        """
+        self._reserve(self.size + 1)
+        row = self.size
+        ticker = self.ticker_ids.get(report.isin_of_the_company)
+        if ticker is None:
+            ticker = self.ticker_ids[report.isin_of_the_company] = len(self.ticker_names)
+            self.ticker_names.append(report.isin_of_the_company)
+            self.ticker_rows[ticker] = []
+        timestamp = report.time_of_the_report.timestamp()
+        self.timestamps[row] = timestamp
+        self.tickers[row] = ticker
+        rows = self.ticker_rows[ticker]
+        if rows and self.timestamps[rows[-1]] > timestamp:
+            self._unsorted_tickers.add(ticker)
+        rows.append(row)
+
+        for column, members in self.enum_columns.items():
+            value = self._get(report, column)
+            if value is None:
+                continue
+            code = members.index(value)
+            self.codes[column][row] = code
+            bitmap = self.bitmaps.get((column, code))
+            if bitmap is None:
+                bitmap = self.bitmaps[(column, code)] = np.zeros((self.capacity + 7) // 8, dtype=np.uint8)
+            bitmap[row >> 3] |= 0x80 >> (row & 7)
+        for column in self.numeric_columns:
+            value = self._get(report, column)
+            if value is not None:
+                self.values[column][row] = value
+        self.size += 1
+        return row
+
+    def extend(self, reports):
+        """Project several reports into the columns.
+
+        Args:
+            reports: The reports, e.g. `ReportStore.get_reports()`.
+        """
+        for report in reports:
+            self.append(report)
+
+    def _ticker_rows(self, ticker: int) -> np.ndarray:
+        """Return the rows of a ticker sorted by time."""
+        if ticker in self._unsorted_tickers:
+            rows = self.ticker_rows[ticker]
+            rows.sort(key=lambda row: self.timestamps[row])
+            self._unsorted_tickers.discard(ticker)
+        return np.asarray(self.ticker_rows[ticker], dtype=np.int64)
+
+    def _time_mask(self, rows: np.ndarray, start: datetime = None, end: datetime = None) -> np.ndarray:
+        mask = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            mask &= self.timestamps[rows] >= start.timestamp()
+        if end is not None:
+            mask &= self.timestamps[rows] <= end.timestamp()
+        return mask
+
+    def filter(self, conditions: dict = None, isin: str = None, start: datetime = None, end: datetime = None) -> np.ndarray:
+        """Return the rows matching every condition, sorted by row.
+
+        Args:
+            conditions (dict): Values by column, see `matching_columns`. A value can be an enum member, value or name,
+                a list of them (any of them matching), or a function of the numeric column array returning a boolean
+                mask. A column suffix matching several columns matches the rows where any of them matches.
+            isin (str): ISIN code of the company.
+            start (datetime): Minimum time of the reports.
+            end (datetime): Maximum time of the reports.
+        """
+        bits = np.full((self.capacity + 7) // 8, 0xFF, dtype=np.uint8)
+        masks = []
+        for name, value in (conditions or {}).items():
+            columns = self.matching_columns(name)
+            enum_columns = [column for column in columns if column in self.enum_columns]
+            if enum_columns and len(enum_columns) != len(columns):
+                raise ValueError(f"Column '{name}' matches both enum and numeric columns: {columns}")
+            if enum_columns:
+                column_bits = np.zeros_like(bits)
+                for column in enum_columns:
+                    for item in (value if isinstance(value, (list, tuple, set)) else [value]):
+                        bitmap = self.bitmaps.get((column, self._code(column, item)))
+                        if bitmap is not None:
+                            column_bits |= bitmap
+                bits &= column_bits
+            else:
+                column_mask = np.zeros(self.size, dtype=bool)
+                for column in columns:
+                    values = self.values[column][:self.size]
+                    column_mask |= value(values) if callable(value) else values == value
+                masks.append(column_mask)
+        mask = np.unpackbits(bits, count=self.size).astype(bool)
+        for numeric_mask in masks:
+            mask &= numeric_mask
+        if isin is not None:
+            ticker = self.ticker_ids.get(isin, -2)
+            mask &= self.tickers[:self.size] == ticker
+        rows = np.nonzero(mask)[0]
+        return rows[self._time_mask(rows, start, end)]
+
+    def transitions(self, column: str, from_value, to_value, isin: str = None, start: datetime = None, end: datetime = None) -> list:
+        """Return the changes of an enum column between consecutive reports of the same ticker.
+
+        Args:
+            column (str): Name of the enum column, see `resolve_column`.
+            from_value: Value of the previous report, an enum member, value or name.
+            to_value: Value of the next report, an enum member, value or name.
+            isin (str): ISIN code of the company, every ticker by default.
+            start (datetime): Minimum time of the next report.
+            end (datetime): Maximum time of the next report.
+
+        Returns:
+            list: (isin, time of the previous report, time of the next report) tuples sorted by time.
+        """
+        column = self.resolve_column(column)
+        codes = self.codes[column]
+        from_code = self._code(column, from_value)
+        to_code = self._code(column, to_value)
+        tickers = [self.ticker_ids[isin]] if isin in self.ticker_ids else ([] if isin is not None else list(self.ticker_rows))
+        results = []
+        for ticker in tickers:
+            rows = self._ticker_rows(ticker)
+            if len(rows) < 2:
+                continue
+            ticker_codes = codes[rows]
+            flips = np.nonzero((ticker_codes[:-1] == from_code) & (ticker_codes[1:] == to_code))[0]
+            flips = flips[self._time_mask(rows[flips + 1], start, end)]
+            for flip in flips:
+                results.append((self.ticker_names[ticker], datetime.fromtimestamp(self.timestamps[rows[flip]]),
+                                datetime.fromtimestamp(self.timestamps[rows[flip + 1]])))
+        return sorted(results, key=lambda result: result[2])
+
+    def records(self, rows, columns: list = None) -> list:
+        """Return the rows as dictionaries of their ISIN, time and columns values.
+
+        Args:
+            rows: The rows, e.g. returned by `filter`.
+            columns (list): Names of the columns to return, every column by default.
+        """
+        columns = [self.resolve_column(column) for column in columns] if columns else self.columns
+        records = []
+        for row in rows:
+            record = {"isin": self.ticker_names[self.tickers[row]], "time": datetime.fromtimestamp(self.timestamps[row])}
+            for column in columns:
+                if column in self.enum_columns:
+                    code = self.codes[column][row]
+                    record[column] = self.enum_columns[column][code] if code >= 0 else None
+                else:
+                    value = self.values[column][row]
+                    record[column] = None if np.isnan(value) else float(value)
+            records.append(record)
+        return records
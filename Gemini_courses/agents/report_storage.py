@@ -0,0 +1,298 @@
+"""Compact binary storage of the analysts reports.
+
+Reports, e.g. `TickerTechnicalAnalysis` or `TickerESGAnalysis`, are encoded from their Pydantic schema:
+- models are arrays of their field values in declaration order, the schema being the dictionary of the keys,
+- enums are the index of their value in the enum,
+- datetimes are ISO strings, other values are kept as is.
+The encoded reports are msgpack framed and zstandard compressed when available.
+
+Each day of reports is an append-only data file with an index file of the ticker ISIN, name, time, offset and
+length of every report. The index is rebuilt from the data file when missing or incomplete. The data file starts
+with the fingerprint of the schema of its reports, a report of another schema is never appended to it.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+from enum import Enum
+from threading import Lock
+from typing import Union, get_args, get_origin
+
+import msgpack
+from pydantic import BaseModel
+
+try:
+    import zstandard as _zstandard
+except ImportError:
+    _zstandard = None
+
+
+class ReportCodec():
+    """Encode and decode the reports of a Pydantic model to and from compact msgpack arrays."""
+
+    def __init__(self, report_model):
+        """
+        Args:
+            report_model: The Pydantic model of the reports, e.g. TickerTechnicalAnalysis.
+        """
+        self.report_model = report_model
+        self._plans = {}
+        self.fingerprint = hashlib.sha256(json.dumps(self._describe(report_model)).encode()).hexdigest()[:16]
+
+    def _plan(self, annotation) -> tuple:
+        """Return the encoding plan of an annotation: (kind, optional, argument)."""
+        optional = False
+        if get_origin(annotation) is Union:
+            arguments = [argument for argument in get_args(annotation) if argument is not type(None)]
+            optional = len(arguments) < len(get_args(annotation))
+            annotation = arguments[0] if len(arguments) == 1 else annotation
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return "model", optional, annotation
+        if isinstance(annotation, type) and issubclass(annotation, Enum):
+            return "enum", optional, list(annotation)
+        if annotation is datetime:
+            return "datetime", optional, None
+        return "raw", optional, None
+
+    def _model_plan(self, model) -> list:
+        """Return the encoding plans of the fields of a model: (name, alias, kind, optional, argument)."""
+        plan = self._plans.get(model)
+        if plan is None:
+            plan = [(name, field.alias or name) + self._plan(field.annotation) for name, field in model.model_fields.items()]
+            self._plans[model] = plan
+        return plan
+
+    def _describe(self, model) -> list:
+        """Return a JSON description of the schema used to detect the incompatible files."""
+        description = []
+        for name, _, kind, optional, argument in self._model_plan(model):
+            if kind == "model":
+                argument = self._describe(argument)
+            elif kind == "enum":
+                argument = [member.value for member in argument]
+            description.append([name, kind, optional, argument])
+        return description
+
+    def _encode_model(self, model, instance) -> list:
+        values = []
+        for name, _, kind, _, argument in self._model_plan(model):
+            value = getattr(instance, name)
+            if value is None or kind == "raw":
+                values.append(value)
+            elif kind == "model":
+                values.append(self._encode_model(argument, value))
+            elif kind == "enum":
+                values.append(argument.index(value))
+            else:
+                values.append(value.isoformat())
+        return values
+
+    @staticmethod
+    def _construct(model, fields: dict):
+        """Create a model instance without validation, as `model_construct` does without its defaults handling."""
+        instance = model.__new__(model)
+        object.__setattr__(instance, "__dict__", fields)
+        object.__setattr__(instance, "__pydantic_fields_set__", set(fields))
+        object.__setattr__(instance, "__pydantic_extra__", None)
+        object.__setattr__(instance, "__pydantic_private__", None)
+        return instance
+
+    def _decode_model(self, model, values: list, by_alias: bool):
+        fields = {}
+        for (name, alias, kind, _, argument), value in zip(self._model_plan(model), values):
+            if value is not None and kind != "raw":
+                if kind == "model":
+                    value = self._decode_model(argument, value, by_alias)
+                elif kind == "enum":
+                    value = argument[value]
+                else:
+                    value = datetime.fromisoformat(value)
+            fields[alias if by_alias else name] = value
+        if by_alias:
+            return fields
+        return self._construct(model, fields)
+
+    def encode(self, report) -> list:
+        """Encode a report into nested arrays.
+
+        Args:
+            report: The report to encode, an instance of the codec Pydantic model.
+        """
+        return self._encode_model(self.report_model, report)
+
+    def decode(self, values: list, validate: bool = False):
+        """Decode nested arrays into a report.
+
+        Args:
+            values (list): The encoded report.
+            validate (bool): Whether to validate the report with Pydantic, encoded reports are already valid.
+        """
+        if validate:
+            return self.report_model.model_validate(self._decode_model(self.report_model, values, by_alias=True))
+        return self._decode_model(self.report_model, values, by_alias=False)
+
+
+class ReportStore():
+    """Append-only storage of the reports of a Pydantic model, one data and index file per day."""
+
+    DATA_EXTENSION = ".reports"
+    INDEX_EXTENSION = ".index"
+
+    def __init__(self, root: str, report_model, compress: bool = True):
+        """
+        Args:
+            root (str): Directory of the store, a sub-directory is used per report model.
+            report_model: The Pydantic model of the reports, e.g. TickerTechnicalAnalysis.
+            compress (bool): Whether to compress the reports, requires zstandard.
+        """
+        self.codec = ReportCodec(report_model)
+        self.directory = os.path.join(root, report_model.__name__)
+        os.makedirs(self.directory, exist_ok=True)
+        self.compress = compress and _zstandard is not None
+        self._compressor = _zstandard.ZstdCompressor(level=9) if self.compress else None
+        self._decompressor = _zstandard.ZstdDecompressor() if _zstandard is not None else None
+        self._indexes = {}
+        self._checked_days = set()
+        self._lock = Lock()
+
+    def _path(self, day: str, extension: str) -> str:
+        return os.path.join(self.directory, day + extension)
+
+    def days(self) -> list:
+        """Return the days of the stored reports, e.g. ["2025-03-14"]."""
+        return sorted(name[:-len(self.DATA_EXTENSION)] for name in os.listdir(self.directory) if name.endswith(self.DATA_EXTENSION))
+
+    def _scan(self, day: str, start: int = 0) -> list:
+        """Return the index entries of the data file of a day from an offset."""
+        entries = []
+        with open(self._path(day, self.DATA_EXTENSION), "rb") as data_file:
+            data_file.seek(start)
+            unpacker = msgpack.Unpacker(data_file, raw=False)
+            offset = start
+            for record in unpacker:
+                end = start + unpacker.tell()
+                if record[0] != "header":
+                    entries.append([record[1], record[2], record[3], offset, end - offset])
+                offset = end
+        return entries
+
+    def _index(self, day: str) -> list:
+        """Return the index entries (isin, name, timestamp, offset, length) of a day, rebuilding the index if needed."""
+        entries = self._indexes.get(day)
+        if entries is not None:
+            return entries
+        entries = []
+        index_path = self._path(day, self.INDEX_EXTENSION)
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as index_file:
+                entries = list(msgpack.Unpacker(index_file, raw=False))
+        data_size = os.path.getsize(self._path(day, self.DATA_EXTENSION))
+        indexed_size = entries[-1][3] + entries[-1][4] if entries else 0
+        if indexed_size != data_size:
+            missing = self._scan(day, start=indexed_size)
+            entries += missing
+            with open(index_path, "ab" if indexed_size else "wb") as index_file:
+                for entry in missing:
+                    index_file.write(msgpack.packb(entry))
+        self._indexes[day] = entries
+        return entries
+
+    def append(self, report) -> tuple:
+        """Append a report to the file of its day and return the (day, offset) of the report.
+
+        Args:
+            report: The report to store, an instance of the store Pydantic model.
+        """
+        payload = msgpack.packb(self.codec.encode(report))
+        compressed = self.compress
+        if compressed:
+            payload = self._compressor.compress(payload)
+        time_of_the_report = report.time_of_the_report
+        day = time_of_the_report.date().isoformat()
+        record = msgpack.packb(["report", report.isin_of_the_company, report.name_of_the_company, time_of_the_report.timestamp(),
+                                compressed, payload])
+
+        with self._lock:
+            data_path = self._path(day, self.DATA_EXTENSION)
+            if not os.path.exists(data_path):
+                with open(data_path, "wb") as data_file:
+                    data_file.write(msgpack.packb(["header", self.codec.report_model.__name__, self.codec.fingerprint]))
+                self._checked_days.add(day)
+            else:
+                self._check_header(day)
+            entries = self._index(day)
+            with open(data_path, "ab") as data_file:
+                offset = data_file.tell()
+                data_file.write(record)
+            entry = [report.isin_of_the_company, report.name_of_the_company, time_of_the_report.timestamp(), offset, len(record)]
+            with open(self._path(day, self.INDEX_EXTENSION), "ab") as index_file:
+                index_file.write(msgpack.packb(entry))
+            entries.append(entry)
+        return day, offset
+
+    def _check_header(self, day: str):
+        """Raise a ValueError if the data file of a day was written with another schema of the reports."""
+        if day in self._checked_days:
+            return
+        with open(self._path(day, self.DATA_EXTENSION), "rb") as data_file:
+            header = next(msgpack.Unpacker(data_file, raw=False))
+        if header[2] != self.codec.fingerprint:
+            raise ValueError(f"The reports of {day} were stored with another schema of {header[1]}.")
+        self._checked_days.add(day)
+
+    def query(self, isin: str = None, name: str = None, start: datetime = None, end: datetime = None) -> list:
+        """Return the (day, index entry) of the reports matching the filters, sorted by time.
+
+        Args:
+            isin (str): ISIN code of the company.
+            name (str): Name of the company.
+            start (datetime): Minimum time of the reports.
+            end (datetime): Maximum time of the reports.
+        """
+        start_timestamp = start.timestamp() if start else None
+        end_timestamp = end.timestamp() if end else None
+        matches = []
+        for day in self.days():
+            if start and day < start.date().isoformat() or end and day > end.date().isoformat():
+                continue
+            with self._lock:
+                entries = self._index(day)
+            for entry in entries:
+                if isin is not None and entry[0] != isin or name is not None and entry[1] != name:
+                    continue
+                if start_timestamp is not None and entry[2] < start_timestamp or end_timestamp is not None and entry[2] > end_timestamp:
+                    continue
+                matches.append((day, entry))
+        return sorted(matches, key=lambda match: match[1][2])
+
+    def load(self, matches: list, validate: bool = False) -> list:
+        """Load the reports of query results.
+
+        Args:
+            matches (list): The (day, index entry) returned by `query`.
+            validate (bool): Whether to validate the reports with Pydantic.
+        """
+        reports = []
+        checked_days = set()
+        files = {}
+        try:
+            for day, entry in matches:
+                if day not in checked_days:
+                    self._check_header(day)
+                    checked_days.add(day)
+                    files[day] = open(self._path(day, self.DATA_EXTENSION), "rb")
+                data_file = files[day]
+                data_file.seek(entry[3])
+                record = msgpack.unpackb(data_file.read(entry[4]), raw=False)
+                payload = record[5]
+                if record[4]:
+                    payload = self._decompressor.decompress(payload)
+                reports.append(self.codec.decode(msgpack.unpackb(payload, raw=False), validate=validate))
+        finally:
+            for data_file in files.values():
+                data_file.close()
+        return reports
+
+    def get_reports(self, isin: str = None, name: str = None, start: datetime = None, end: datetime = None, validate: bool = False) -> list:
+        """Return the reports matching the filters, sorted by time. See `query` for the arguments."""
+        return self.load(self.query(isin=isin, name=name, start=start, end=end), validate=validate)
@@ -1,17 +1,14 @@
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import PromptTemplate, ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain.output_parsers.retry import RetryWithErrorOutputParser, NAIVE_RETRY_WITH_ERROR_PROMPT
-from langchain_core.runnables import RunnableParallel, RunnableLambda
-
 from . import technical_analysis_pydantic_model as _pydantic_models
-from time import time as _time
+from .technical_analysis_aggregation import TechnicalAnalysisAggregator
+from .technical_analysis_incremental import TechnicalAnalysisChangeDetector, TechnicalAnalysisState
+import json
+
+from custom_features.analyst_logic import AnalystLLMLogic
+from custom_features import reasoning as _reasoning
 
 
-class TechnicalAnalysisLLMLogic():
+class TechnicalAnalysisLLMLogic(AnalystLLMLogic):
 
-    MODEL = "cogito:8b"
-    DEEP_THINKING_INSTRUCTION = "Enable deep thinking subroutine.\n\n"
     INDICATOR_REQUIRED_PYDANTIC_MODELS = {
         "rsi": _pydantic_models.RSIEvaluation,
         "macd": _pydantic_models.MACDEvaluation,
@@ -28,7 +25,17 @@ class TechnicalAnalysisLLMLogic():
         "short_timeframe_data": _pydantic_models.ShortTimeframeData,
         "long_timeframe_data": _pydantic_models.LongTimeframeData,
     }
-    GENERIC_SYSTEM_TEMPLATE = DEEP_THINKING_INSTRUCTION + (
+    # Leaves of a timeframe, compared by the change detector of the incremental mode.
+    LEAVES = tuple(INDICATOR_REQUIRED_PYDANTIC_MODELS) + ("support", "resistance", "prices", "volumes")
+    # Fields of the 'Short/LongTimeframeData' outputs by component name.
+    TIMEFRAME_DATA_FIELDS = {
+        "support": "supports_evaluation",
+        "resistance": "resistances_evaluation",
+        "prices": "prices_evaluation",
+        "indicators": "indicators",
+        "volumes": "volumes_evaluation",
+    }
+    GENERIC_SYSTEM_TEMPLATE = (
         "As trading technical analyst expert, your task is to generate the technical analysis report for {stock} at the specified JSON format. "
         "Use the data (simulated for the exercice) to generate the technical analysis of {stock} action totally filling the JSON schema described below. "
         "The timeframe of {stock} data is {timeframe}. "
@@ -37,7 +44,7 @@ class TechnicalAnalysisLLMLogic():
         "Thus, You MUST RESPECT the type of JSON schema entries. "
         "Once again, the JSON schema described above is CRITICAL and MUST BE RESPECTED."
         )
-    INDICATORS_SYSTEM_TEMPLATE = DEEP_THINKING_INSTRUCTION + (
+    INDICATORS_SYSTEM_TEMPLATE = (
         "As trading technical analyst expert, your task is to generate the technical analysis report for {stock} at the specified JSON format. "
         "The JSON of the RSI evaluation is provided here:\n{rsi_json}\n"
         "The JSON of the MACD evaluation is provided here:\n{macd_json}\n"
@@ -49,7 +56,7 @@ class TechnicalAnalysisLLMLogic():
         "Thus, You MUST RESPECT the type of JSON schema entries. "
         "Once again, the JSON schema described above is CRITICAL and MUST BE RESPECTED."
         )
-    TIMEFRAME_DATA_SYSTEM_TEMPLATE = DEEP_THINKING_INSTRUCTION + (
+    TIMEFRAME_DATA_SYSTEM_TEMPLATE = (
         "As trading technical analyst expert, your task is to generate the technical analysis report for {stock} at the specified JSON format. "
         "The JSON of the supports evaluation is provided here:\n{support_json}\n"
         "The JSON of the resistances evaluation is provided here:\n{resistance_json}\n"
@@ -63,7 +70,7 @@ class TechnicalAnalysisLLMLogic():
         "Thus, You MUST RESPECT the type of JSON schema entries. "
         "Once again, the JSON schema described above is CRITICAL and MUST BE RESPECTED."
         )
-    TICKER_SYSTEM_TEMPLATE = DEEP_THINKING_INSTRUCTION + (
+    TICKER_SYSTEM_TEMPLATE = (
         "As trading technical analyst expert, your task is to generate the technical analysis report for {stock} at the specified JSON format. "
         "The JSON of the short timeframe analysis is {short_timeframe_data_json}."
         "The JSON of the long timeframe analysis is {long_timeframe_data_json}."
@@ -72,23 +79,46 @@ class TechnicalAnalysisLLMLogic():
         "\n{format_instructions}\n"
         "Once again, the JSON schema described above is CRITICAL and MUST BE RESPECTED."
         )
+    RAW_VALUES_SYSTEM_TEMPLATE = "\nThe raw values provided by the tool are:\n{raw_values_json}\n"
+    CONCLUSION_SYSTEM_TEMPLATE = (
+        "As trading technical analyst expert, your task is to write the conclusion of the technical analysis of {stock}. "
+        "The timeframe of {stock} data is {timeframe}. "
+        "The JSON of the evaluations is provided here:\n{evaluations_json}\n"
+        "The synthesis trading action is {trading_action} and the support and resistance interaction status is {interaction_status}. "
+        "Write a short conclusion about the market at this time in plain text, without JSON."
+        )
 
-    def __new__(cls, *args, **kwargs):
-        retry_template = NAIVE_RETRY_WITH_ERROR_PROMPT.template.split("\n")
-        retry_template = retry_template[:-1] + ["YOU MUST RESPECT THE SCHEMA PROVIDED IN THE PROMPT."] + retry_template[-1:]
-        cls.RETRY_PROMPT_TEMPLATE = cls.DEEP_THINKING_INSTRUCTION + "\n".join(retry_template)
-        return super().__new__(cls, *args, **kwargs)
-
-    def __init__(self, stock: str = "AAPL"):
+    def __init__(self, stock: str = "AAPL", aggregation_mode: str = "llm", llm_conclusion: bool = True, aggregator: TechnicalAnalysisAggregator = None,
+                 model_params: dict = None, deep_thinking=True, incremental_state: TechnicalAnalysisState = None,
+                 change_detector: TechnicalAnalysisChangeDetector = None):
+        """
+        Args:
+            stock (str): Ticker of the stock to analyse.
+            aggregation_mode (str): "llm" to generate the aggregate nodes with the LLM, "rules" to build them from their children with
+                weighted voting, the LLM being only used when the children disagree beyond the aggregator threshold.
+            llm_conclusion (bool): In "rules" mode, whether to write the synthesis conclusions with the LLM or from a template.
+            aggregator (TechnicalAnalysisAggregator): Aggregator of the "rules" mode, with the default weights by default.
+            model_params (dict): Additionnal parameters of the chat models, e.g. {"base_url": "http://localhost:11434"}.
+            deep_thinking (bool | dict): Whether to enable the deep thinking of the model, for every node or by node name,
+                e.g. {"RsiEvaluation": False}. The latency and token cost of every node are recorded in `reasoning_stats`.
+            incremental_state (TechnicalAnalysisState): Previous reports of the tickers enabling the incremental mode: only the
+                subtrees whose raw values changed significantly are generated again, see `tickers_output_parser`.
+            change_detector (TechnicalAnalysisChangeDetector): Change detector of the incremental mode, with the default
+                significance thresholds by default.
+        """
         # self.model = ChatOllama(model=self.MODEL, num_gpu=256, num_ctx=4092 * 2, num_predict=1000 * 2)
         # self.error_model = ChatOllama(model=self.MODEL, num_gpu=256, num_ctx=4092 * 4, num_predict=1000 * 4)
-        self.stock = stock
+        super().__init__(stock=stock, model_params=model_params, deep_thinking=deep_thinking)
+        self.aggregation_mode = aggregation_mode
+        self.llm_conclusion = llm_conclusion
+        self.aggregator = aggregator or TechnicalAnalysisAggregator()
+        self.incremental_state = incremental_state
+        self.change_detector = change_detector or TechnicalAnalysisChangeDetector()
         self.short_timeframe = "5 minutes"
         self.long_timeframe = "1 hour"
-        self.timers = []
 
     def generic_output_parser(self, pydantic_model, system_prompt_template: str, timeframe: str = None, input_variables: list = None, json_docs: dict = None):
-        """Generic template to generate Pydantic outputs.
+        """Generic template to generate Pydantic outputs, with the timeframe of the stock evaluation.
 
         Args:
             pydantic_model: The Pydantic model to product the return on.
@@ -97,126 +127,215 @@ class TechnicalAnalysisLLMLogic():
             input_variables (list): PromptTemplate additionnal input variables.
             json_docs (dict): Additionnal values from documentations to pass at model invocation.
         """
-        start_time = _time()
-        init_input_variables = ["stock"]
-        invocation = {"stock": self.stock}
         if timeframe:
-            init_input_variables += ["timeframe"]
-            invocation.update({"timeframe": timeframe})
-        if input_variables:
-            init_input_variables += input_variables
-        if json_docs:
-            invocation.update(json_docs)
+            input_variables = ["timeframe"] + (input_variables or [])
+            json_docs = {"timeframe": timeframe, **(json_docs or {})}
+        return super().generic_output_parser(pydantic_model, system_prompt_template, input_variables=input_variables, json_docs=json_docs)
 
-        evaluation_parser = PydanticOutputParser(pydantic_object=pydantic_model)
+    def conclusion_output_parser(self, timeframe: str, evaluations: dict, synthesis_values: dict) -> str:
+        """Generate the free-text conclusion of a synthesis whose structured values are already known.
 
-        if isinstance(pydantic_model, _pydantic_models.TickerTechnicalAnalysis):
-            factor = 2
-        else:
-            factor = 1
+        Args:
+            timeframe (str): Base timeframe of the stock evaluation, e.g. "5 minutes" or "1 hour".
+            evaluations (dict): The evaluations of the timeframe by name.
+            synthesis_values (dict): The structured values of the synthesis.
+        """
+        from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 
+        deep_thinking = self.is_deep_thinking("Conclusion", default=False)
+        run = self.reasoning_stats.start("Conclusion", deep_thinking)
         prompt_template = ChatPromptTemplate([
-            SystemMessagePromptTemplate.from_template(template=system_prompt_template),
+            SystemMessagePromptTemplate.from_template(template=(self.DEEP_THINKING_INSTRUCTION if deep_thinking else "") + self.CONCLUSION_SYSTEM_TEMPLATE),
             HumanMessagePromptTemplate.from_template(template="{stock}"),
-            ],
-            input_variables=init_input_variables,
-            partial_variables={"format_instructions": evaluation_parser.get_format_instructions()}
-        )
-
-        error_model = ChatOllama(model=self.MODEL, num_gpu=256, num_ctx=4092 * 4 * factor, num_predict=1000 * 4 * factor)
-        retry_parser = RetryWithErrorOutputParser(
-            parser=evaluation_parser,
-            retry_chain=PromptTemplate.from_template(self.RETRY_PROMPT_TEMPLATE) | error_model | (lambda response:  response.content),
-            max_retries=15,
-        )
+        ])
+        model = self.MODEL_REGISTRY.resolve(streaming=True, num_ctx=4092 * 2, num_predict=1000, extract_reasoning=True, **self.model_params)
+        splitter = _reasoning.ReasoningSplitter()
+        message = None
+        for chunk in (prompt_template | model).stream({
+            "stock": self.stock,
+            "timeframe": timeframe,
+            "evaluations_json": "\n".join(f"{name}: {evaluation.model_dump_json(by_alias=True)}" for name, evaluation in evaluations.items()),
+            "trading_action": synthesis_values["synthese_trading_action"].value,
+            "interaction_status": synthesis_values["synthese_support_resistance_interaction_status"].value,
+        }):
+            splitter.feed(chunk.content if isinstance(chunk.content, str) else "")
+            message = chunk if message is None else message + chunk
+        splitter.close()
+        reasoning = "\n".join(part for part in (message.additional_kwargs.get("reasoning_content", ""), splitter.reasoning) if part)
+        self.reasoning_stats.add_message(run, message, reasoning=reasoning, answer=splitter.answer)
 
-        model = ChatOllama(model=self.MODEL, num_gpu=256, num_ctx=4092 * 2 * factor, num_predict=1000 * 2 * factor)
-        structured_model = model.with_structured_output(pydantic_model)
-        completion_chain = prompt_template | structured_model  # | RunnableLambda(lambda response: re.sub(r"<think>[\n\W\w]+</think>", "", response.content))
-        chain = RunnableParallel(
-            completion=completion_chain, prompt_value=prompt_template
-        ) | RunnableLambda(lambda response: retry_parser.parse_with_prompt(completion=response["completion"].model_dump_json(),
-                                                                           prompt_value=response["prompt_value"]))
+        self.timers.append(self.reasoning_stats.finish(run))
+        print("\t\t\tTime:", self.timers[-1])
 
-        response = chain.invoke(invocation)
+        return splitter.answer.strip()
 
-        self.timers.append(round(_time() - start_time, 3))
-        print("\t\t\tTime:", self.timers[-1])
+    def leaf_output_parser(self, pydantic_model, timeframe, raw_values: dict = None):
+        """Generate a leaf evaluation, from the raw values of its tool if provided.
 
-        return response
+        Args:
+            pydantic_model: The Pydantic model to product the return on.
+            timeframe (str): Base timeframe of the stock evaluation, e.g. "5 minutes" or "1 hour".
+            raw_values (dict): Raw values of the tool, e.g. {"rsi_value": 61.2}.
+        """
+        if not raw_values:
+            return self.generic_output_parser(pydantic_model=pydantic_model, system_prompt_template=self.GENERIC_SYSTEM_TEMPLATE,
+                                              timeframe=timeframe)
+        return self.generic_output_parser(pydantic_model=pydantic_model, system_prompt_template=self.GENERIC_SYSTEM_TEMPLATE + self.RAW_VALUES_SYSTEM_TEMPLATE,
+                                          timeframe=timeframe, input_variables=["raw_values_json"], json_docs={"raw_values_json": json.dumps(raw_values)})
 
-    def indicators_components_output_parser(self, pydantic_model, timeframe):
+    def indicators_components_output_parser(self, pydantic_model, timeframe, raw_values: dict = None):
         """Generate components of 'Indicators' Pydantic output.
 
         Args:
             pydantic_model: The Pydantic model to product the return on.
             timeframe (str): Base timeframe of the stock evaluation, e.g. "5 minutes" or "1 hour".
+            raw_values (dict): Raw values of the tool, e.g. {"rsi_value": 61.2}.
         """
-        return self.generic_output_parser(pydantic_model=pydantic_model, system_prompt_template=self.GENERIC_SYSTEM_TEMPLATE,
-                                          timeframe=timeframe)
+        return self.leaf_output_parser(pydantic_model=pydantic_model, timeframe=timeframe, raw_values=raw_values)
 
-    def indicators_output_parser(self, timeframe):
+    def indicators_output_parser(self, timeframe, previous=None, changed: set = None, inputs: dict = None):
         """Generate the 'Indicators' output parser.
 
         Args:
             timeframe (str): Base timeframe of the stock evaluation, e.g. "5 minutes" or "1 hour".
+            previous (Indicators): Previous output, whose unchanged evaluations are reused.
+            changed (set): Names of the indicators to generate again when `previous` is given.
+            inputs (dict): Raw values of the tools by indicator name.
         """
+        inputs = inputs or {}
         json_input = {}
         for name, pydantic_model in self.INDICATOR_REQUIRED_PYDANTIC_MODELS.items():
+            if previous is not None and name not in changed:
+                print("\t\t** ", name, " (unchanged)")
+                json_input[name + "_json"] = getattr(previous, name + "_evaluation")
+                continue
             print("\t\t** ", name)
-            json_value = self.indicators_components_output_parser(pydantic_model=pydantic_model, timeframe=timeframe)
+            json_value = self.indicators_components_output_parser(pydantic_model=pydantic_model, timeframe=timeframe, raw_values=inputs.get(name))
             # print(name, " ", json_value)
             json_input[name + "_json"] = json_value  # .model_dump_json()
 
+        if self.aggregation_mode == "rules":
+            print("\t** indicators gathering (rules)")
+            return self.aggregator.indicators(**{name: json_input[name + "_json"] for name in self.INDICATOR_REQUIRED_PYDANTIC_MODELS})
+
         print("\t** indicators gathering")
         # print("JSON inputs", json_input)
-        return self.generic_output_parser(pydantic_model=_pydantic_models.Indicators, system_prompt_template=self.INDICATORS_SYSTEM_TEMPLATE,
-                                          timeframe=timeframe, input_variables=list(json_input.keys()), json_docs=json_input)
+        response = self.generic_output_parser(pydantic_model=_pydantic_models.Indicators, system_prompt_template=self.INDICATORS_SYSTEM_TEMPLATE,
+                                              timeframe=timeframe, input_variables=list(json_input.keys()), json_docs=json_input)
+        if previous is not None:
+            response = response.model_copy(update={name + "_evaluation": json_input[name + "_json"] for name in self.INDICATOR_REQUIRED_PYDANTIC_MODELS})
+        return response
 
-    def timeframe_data_components_output_parser(self, pydantic_model, timeframe):
+    def timeframe_data_components_output_parser(self, pydantic_model, timeframe, raw_values: dict = None):
         """Generate components of 'Timeframe Data' Pydantic output.
 
         Args:
             pydantic_model: The Pydantic model to product the return on.
             timeframe (str): Base timeframe of the stock evaluation, e.g. "5 minutes" or "1 hour".
+            raw_values (dict): Raw values of the tool, e.g. {"prices_value": 182.4}.
         """
-        return self.generic_output_parser(pydantic_model=pydantic_model, system_prompt_template=self.GENERIC_SYSTEM_TEMPLATE,
-                                          timeframe=timeframe)
+        return self.leaf_output_parser(pydantic_model=pydantic_model, timeframe=timeframe, raw_values=raw_values)
 
-    def timeframe_data_output_parser(self, timeframe_pydantic_model, timeframe: str):
+    def timeframe_data_output_parser(self, timeframe_pydantic_model, timeframe: str, previous=None, changed: set = None, inputs: dict = None):
         """Generate 'Timeframe Data' output parser.
 
         Args:
             timeframe_pydantic_model: The Pydantic model to product the return on.
             timeframe (str): Base timeframe of the stock evaluation, e.g. "5 minutes" or "1 hour".
+            previous: Previous output, whose unchanged evaluations are reused.
+            changed (set): Names of the leaves to generate again when `previous` is given.
+            inputs (dict): Raw values of the tools by leaf name.
         """
+        inputs = inputs or {}
         json_input = {}
         for name, pydantic_model in self.TIMEFRAME_DATA_REQUIRED_PYDANTIC_MODELS.items():
-            print("\t** ", name)
             if "indicators" in name:
-                json_value = self.indicators_output_parser(timeframe=timeframe)
+                if previous is not None and not changed & set(self.INDICATOR_REQUIRED_PYDANTIC_MODELS):
+                    print("\t** ", name, " (unchanged)")
+                    json_value = previous.indicators
+                else:
+                    print("\t** ", name)
+                    json_value = self.indicators_output_parser(timeframe=timeframe, previous=previous.indicators if previous is not None else None,
+                                                               changed=changed, inputs=inputs)
+            elif previous is not None and name not in changed:
+                print("\t** ", name, " (unchanged)")
+                json_value = getattr(previous, self.TIMEFRAME_DATA_FIELDS[name])
             else:
-                json_value = self.timeframe_data_components_output_parser(pydantic_model=pydantic_model, timeframe=timeframe)
+                print("\t** ", name)
+                json_value = self.timeframe_data_components_output_parser(pydantic_model=pydantic_model, timeframe=timeframe, raw_values=inputs.get(name))
             json_input[name + "_json"] = json_value  # .model_dump_json()
 
+        if self.aggregation_mode == "rules":
+            evaluations = {name: json_input[name + "_json"] for name in self.TIMEFRAME_DATA_REQUIRED_PYDANTIC_MODELS}
+            scores = self.aggregator.component_scores(**evaluations)
+            if not self.aggregator.is_disagreeing(scores):
+                print("\t**  synthesis (rules)")
+                synthesis_values = self.aggregator.synthesis_values(**evaluations)
+                conclusion = None
+                if self.llm_conclusion:
+                    conclusion = self.conclusion_output_parser(timeframe=timeframe, evaluations=evaluations, synthesis_values=synthesis_values)
+                return self.aggregator.timeframe_data(timeframe_pydantic_model, conclusion=conclusion, synthesis_values=synthesis_values,
+                                                      **evaluations)
+            print("\t**  children disagreement:", round(self.aggregator.disagreement(scores), 3))
+
         print("\t**  synthesis")
-        return self.generic_output_parser(pydantic_model=timeframe_pydantic_model, system_prompt_template=self.TIMEFRAME_DATA_SYSTEM_TEMPLATE,
-                                          timeframe=timeframe, input_variables=list(json_input.keys()), json_docs=json_input)
+        response = self.generic_output_parser(pydantic_model=timeframe_pydantic_model, system_prompt_template=self.TIMEFRAME_DATA_SYSTEM_TEMPLATE,
+                                              timeframe=timeframe, input_variables=list(json_input.keys()), json_docs=json_input)
+        if previous is not None:
+            # The evaluations, reused or generated again, are spliced in the new output as they are.
+            response = response.model_copy(update={field: json_input[name + "_json"] for name, field in self.TIMEFRAME_DATA_FIELDS.items()})
+        return response
 
-    def tickers_output_parser(self, timeframe=None):
+    def tickers_output_parser(self, timeframe=None, inputs: dict = None):
         """Generate the ticker technical analysis.
 
+        In incremental mode, the previous report of the ticker is reused: only the leaves whose raw values changed
+        significantly since their last computation are generated again, with their ancestors. The leaves without raw
+        values in `inputs` are always generated again. The previous report is returned as is, with the time of its
+        generation, when no leaf changed.
+
         Args:
             timeframe (list): Timeframes list: e.g. ["5 minutes", "1 hour"].
+            inputs (dict): Raw values of the tools by timeframe data name and leaf name, e.g.
+                {"long_timeframe_data": {"rsi": {"rsi_value": 61.2}, "prices": {"prices_value": 182.4}}}.
         """
+        inputs = inputs or {}
+        previous_report, previous_inputs = None, {}
+        if self.incremental_state is not None:
+            previous_report, previous_inputs = self.incremental_state.get(self.stock)
+        reference_inputs = {}
         json_input = {}
         for (name, pydantic_model), timer in zip(self.TICKER_REQUIRED_PYDANTIC_MODELS.items(), timeframe):
-            print("** ", name, " => ", timer)
-            json_value = self.timeframe_data_output_parser(timeframe_pydantic_model=pydantic_model, timeframe=timer)
+            timeframe_inputs = inputs.get(name, {})
+            previous, changed = None, None
+            if previous_report is not None:
+                previous = getattr(previous_report, name)
+                changed = self.change_detector.changed_nodes(previous_inputs.get(name, {}), timeframe_inputs, nodes=self.LEAVES)
+                # The raw values of the unchanged leaves stay the ones of their last computation.
+                reference_inputs[name] = self.change_detector.reference_inputs(previous_inputs.get(name, {}), timeframe_inputs, changed)
+                if not changed:
+                    print("** ", name, " => ", timer, " (unchanged)")
+                    json_input[name + "_json"] = previous
+                    continue
+                print("** ", name, " => ", timer, " changed: ", sorted(changed))
+            else:
+                reference_inputs[name] = self.change_detector.reference_inputs({}, timeframe_inputs)
+                print("** ", name, " => ", timer)
+            json_value = self.timeframe_data_output_parser(timeframe_pydantic_model=pydantic_model, timeframe=timer, previous=previous, changed=changed,
+                                                           inputs=timeframe_inputs)
             json_input[name + "_json"] = json_value  # .model_dump_json()
 
-        print()
-        print("Ticker Ananlysis")
-        print()
-        return self.generic_output_parser(pydantic_model=_pydantic_models.TickerTechnicalAnalysis, system_prompt_template=self.TICKER_SYSTEM_TEMPLATE,
-                                          input_variables=list(json_input.keys()), json_docs=json_input)
+        if previous_report is not None and all(json_input[name + "_json"] is getattr(previous_report, name) for name in self.TICKER_REQUIRED_PYDANTIC_MODELS):
+            print("Ticker Analysis (unchanged)")
+            report = previous_report
+        else:
+            print()
+            print("Ticker Ananlysis")
+            print()
+            report = self.generic_output_parser(pydantic_model=_pydantic_models.TickerTechnicalAnalysis, system_prompt_template=self.TICKER_SYSTEM_TEMPLATE,
+                                                input_variables=list(json_input.keys()), json_docs=json_input)
+            if previous_report is not None:
+                report = report.model_copy(update={name: json_input[name + "_json"] for name in self.TICKER_REQUIRED_PYDANTIC_MODELS})
+        if self.incremental_state is not None:
+            self.incremental_state.set(self.stock, report, reference_inputs)
+        return report
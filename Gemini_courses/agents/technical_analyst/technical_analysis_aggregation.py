@@ -0,0 +1,194 @@
+"""Deterministic rule-based aggregation of the technical analysis evaluations.
+
+The aggregate nodes ('Indicators', 'Short/LongTimeframeData' and the structured parts of their 'Synthesis') are
+built directly from the child evaluations instead of an LLM call:
+- every evaluation votes with a score in [-1, 1] computed from its weighted trading action and trends,
+- the weighted average of the votes gives the synthesis trading action,
+- the support and resistance interactions give the synthesis interaction status and implication,
+- the raw tool values give the synthesis remarkable values.
+The spread of the votes measures the disagreement of the children, so that the LLM is only called when it is
+beyond a threshold.
+"""
+from . import technical_analysis_pydantic_model as _pydantic_models
+
+
+TRADING_ACTION_SCORES = {
+    _pydantic_models.TradingActions.BUY: 1.0,
+    _pydantic_models.TradingActions.OUTPERFORM: 0.5,
+    _pydantic_models.TradingActions.HOLD: 0.0,
+    _pydantic_models.TradingActions.UNDERPERFORM: -0.5,
+    _pydantic_models.TradingActions.SELL: -1.0,
+}
+TREND_SCORES = {
+    _pydantic_models.TrendCategories.STRONG_BULLISH: 1.0,
+    _pydantic_models.TrendCategories.BULLISH: 0.5,
+    _pydantic_models.TrendCategories.CONSOLIDATION: 0.0,
+    _pydantic_models.TrendCategories.BEARISH: -0.5,
+    _pydantic_models.TrendCategories.STRONG_BEARISH: -1.0,
+}
+# Minimum scores of the trading actions, from the most bullish to the most bearish.
+TRADING_ACTION_THRESHOLDS = [
+    (0.6, _pydantic_models.TradingActions.BUY),
+    (0.2, _pydantic_models.TradingActions.OUTPERFORM),
+    (-0.2, _pydantic_models.TradingActions.HOLD),
+    (-0.6, _pydantic_models.TradingActions.UNDERPERFORM),
+    (-1.0, _pydantic_models.TradingActions.SELL),
+]
+
+
+class TechnicalAnalysisAggregator():
+    """Build the aggregate nodes of the technical analysis from their children with weighted voting."""
+
+    EVALUATION_WEIGHTS = {"trading_action": 0.4, "primary_trend": 0.3, "secondary_trend": 0.2, "minor_trend": 0.1}
+    COMPONENT_WEIGHTS = {"prices": 0.35, "volumes": 0.15, "rsi": 0.2, "macd": 0.2, "bollinger_bands": 0.1}
+    SUPPORT_STATUSES = (_pydantic_models.SupportResistanceInteractionStatus.BREAKING_BELOW_SUPPORT,
+                        _pydantic_models.SupportResistanceInteractionStatus.TESTING_SUPPORT)
+    RESISTANCE_STATUSES = (_pydantic_models.SupportResistanceInteractionStatus.BREAKING_ABOVE_RESISTANCE,
+                           _pydantic_models.SupportResistanceInteractionStatus.TESTING_RESISTANCE)
+
+    def __init__(self, evaluation_weights: dict = None, component_weights: dict = None, disagreement_threshold: float = 0.5):
+        """
+        Args:
+            evaluation_weights (dict): Weights of the trading action and trends in the vote of an evaluation.
+            component_weights (dict): Weights of the evaluations votes in the synthesis, by component name.
+            disagreement_threshold (float): Spread of the votes, between 0 and 1, above which the children disagree.
+        """
+        self.evaluation_weights = evaluation_weights or self.EVALUATION_WEIGHTS
+        self.component_weights = component_weights or self.COMPONENT_WEIGHTS
+        self.disagreement_threshold = disagreement_threshold
+
+    def evaluation_score(self, evaluation) -> float:
+        """Return the vote in [-1, 1] of an evaluation from its trading action and trends."""
+        scores = {
+            "trading_action": TRADING_ACTION_SCORES[evaluation.trading_action],
+            "primary_trend": TREND_SCORES[evaluation.primary_trend],
+            "secondary_trend": TREND_SCORES[evaluation.secondary_trend],
+            "minor_trend": TREND_SCORES[evaluation.minor_trend],
+        }
+        total_weight = sum(self.evaluation_weights.values())
+        return sum(self.evaluation_weights[name] * score for name, score in scores.items()) / total_weight
+
+    def component_scores(self, prices=None, volumes=None, indicators=None, **kwargs) -> dict:
+        """Return the votes of the evaluations of a timeframe, by component name.
+
+        Args:
+            prices: The prices evaluation.
+            volumes: The volumes evaluation.
+            indicators (Indicators): The indicators evaluations.
+        """
+        evaluations = {"prices": prices, "volumes": volumes}
+        if indicators is not None:
+            evaluations.update({"rsi": indicators.rsi_evaluation, "macd": indicators.macd_evaluation,
+                                "bollinger_bands": indicators.bollinger_bands_evaluation})
+        return {name: self.evaluation_score(evaluation) for name, evaluation in evaluations.items()
+                if evaluation is not None and self.component_weights.get(name)}
+
+    def vote(self, scores: dict) -> float:
+        """Return the weighted average of the votes."""
+        total_weight = sum(self.component_weights[name] for name in scores)
+        if not total_weight:
+            return 0.0
+        return sum(self.component_weights[name] * score for name, score in scores.items()) / total_weight
+
+    @staticmethod
+    def disagreement(scores: dict) -> float:
+        """Return the spread of the votes, from 0 (unanimous) to 1 (opposite extremes)."""
+        if len(scores) < 2:
+            return 0.0
+        return (max(scores.values()) - min(scores.values())) / 2
+
+    def is_disagreeing(self, scores: dict) -> bool:
+        """Return whether the spread of the votes is beyond the disagreement threshold."""
+        return self.disagreement(scores) > self.disagreement_threshold
+
+    @staticmethod
+    def trading_action(score: float):
+        """Return the trading action of a vote."""
+        for threshold, trading_action in TRADING_ACTION_THRESHOLDS:
+            if score >= threshold:
+                return trading_action
+        return _pydantic_models.TradingActions.SELL
+
+    def indicators(self, rsi=None, macd=None, bollinger_bands=None):
+        """Gather the indicators evaluations into the 'Indicators' output.
+
+        Args:
+            rsi: The RSI evaluation.
+            macd: The MACD evaluation.
+            bollinger_bands: The Bollinger Bands evaluation.
+        """
+        return _pydantic_models.Indicators(rsi_evaluation=rsi, macd_evaluation=macd, bollinger_bands_evaluation=bollinger_bands)
+
+    def support_resistance_interaction(self, support, resistance) -> tuple:
+        """Return the (status, implication) of the most relevant of the support and resistance interactions.
+
+        A support or resistance being tested or broken prevails, the support interaction is used otherwise.
+        """
+        if support.interaction_status in self.SUPPORT_STATUSES:
+            return support.interaction_status, support.interaction_implication
+        if resistance.interaction_status in self.RESISTANCE_STATUSES:
+            return resistance.interaction_status, resistance.interaction_implication
+        return support.interaction_status, support.interaction_implication
+
+    @staticmethod
+    def remarkable_values(support=None, resistance=None, prices=None, volumes=None, indicators=None, **kwargs) -> dict:
+        """Return the raw tool values of the evaluations as remarkable values."""
+        evaluations = {"support": support, "resistance": resistance, "prices": prices, "volumes": volumes}
+        if indicators is not None:
+            evaluations.update({"rsi": indicators.rsi_evaluation, "macd": indicators.macd_evaluation,
+                                "bollinger_bands": indicators.bollinger_bands_evaluation})
+        values = {}
+        for name, evaluation in evaluations.items():
+            raw_tool_data = getattr(evaluation, "raw_tool_data", None)
+            if raw_tool_data is not None:
+                values[name] = raw_tool_data.model_dump()
+        return values
+
+    def synthesis_values(self, support, resistance, prices=None, volumes=None, indicators=None) -> dict:
+        """Return the structured values of the synthesis of a timeframe.
+
+        Args:
+            support: The support evaluation.
+            resistance: The resistance evaluation.
+            prices: The prices evaluation.
+            volumes: The volumes evaluation.
+            indicators (Indicators): The indicators evaluations.
+        """
+        scores = self.component_scores(prices=prices, volumes=volumes, indicators=indicators)
+        status, implication = self.support_resistance_interaction(support, resistance)
+        return {
+            "synthese_remarkable_values": self.remarkable_values(support=support, resistance=resistance, prices=prices, volumes=volumes,
+                                                                 indicators=indicators),
+            "synthese_trading_action": self.trading_action(self.vote(scores)),
+            "synthese_support_resistance_comment": f"Support: {support.evaluation} Resistance: {resistance.evaluation}",
+            "synthese_support_resistance_interaction_status": status,
+            "synthese_support_resistance_interaction_implication": implication,
+        }
+
+    @staticmethod
+    def template_conclusion(synthesis_values: dict) -> str:
+        """Return a conclusion written from the structured values of a synthesis, without LLM."""
+        return (f"Weighted vote of the evaluations: {synthesis_values['synthese_trading_action'].value}. "
+                f"Support and resistance interaction: {synthesis_values['synthese_support_resistance_interaction_status'].value} "
+                f"({synthesis_values['synthese_support_resistance_interaction_implication'].value}).")
+
+    def timeframe_data(self, timeframe_pydantic_model, support, resistance, prices, indicators, volumes, conclusion: str = None,
+                       synthesis_values: dict = None):
+        """Build the 'Short/LongTimeframeData' output from its evaluations.
+
+        Args:
+            timeframe_pydantic_model: ShortTimeframeData or LongTimeframeData.
+            support: The support evaluation.
+            resistance: The resistance evaluation.
+            prices: The prices evaluation.
+            indicators (Indicators): The indicators evaluations.
+            volumes: The volumes evaluation.
+            conclusion (str): Conclusion of the synthesis, a templated one by default.
+            synthesis_values (dict): Structured values of the synthesis, computed from the evaluations by default.
+        """
+        if synthesis_values is None:
+            synthesis_values = self.synthesis_values(support=support, resistance=resistance, prices=prices, volumes=volumes, indicators=indicators)
+        synthesis = _pydantic_models.Synthesis(conclusion=conclusion or self.template_conclusion(synthesis_values), **synthesis_values)
+        synthesis_field = next(name for name in timeframe_pydantic_model.model_fields if name.endswith("_synthesis"))
+        return timeframe_pydantic_model(supports_evaluation=support, resistances_evaluation=resistance, prices_evaluation=prices,
+                                        indicators=indicators, volumes_evaluation=volumes, **{synthesis_field: synthesis})
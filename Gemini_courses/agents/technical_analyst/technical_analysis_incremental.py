@@ -0,0 +1,171 @@
+"""Change detection for the incremental re-analysis of the tickers.
+
+The inputs of an analysis are the raw tool values of its leaves by timeframe, e.g.:
+    {"long_timeframe_data": {"rsi": {"rsi_value": 61.2}, "prices": {"prices_value": 182.4},
+                             "support": {"close_value": 180.1, "middle_value": 176.5, "far_value": 170.0}, ...}}
+The values used for the last computation of every leaf are kept with the previous report of the ticker, with the
+price of that computation for the leaves measured against the price (supports, resistances). A leaf is computed
+again only when one of its values moved beyond its significance threshold since then, its ancestors being computed
+again too, the other results being spliced from the previous report. A leaf without current raw values can not be
+compared and is always computed again.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from . import technical_analysis_pydantic_model as _pydantic_models
+
+
+# Significance thresholds of the raw values by leaf, as (kind, threshold):
+# - "absolute": absolute change of the value, e.g. RSI points,
+# - "relative": change relative to the previous value,
+# - "price_distance": change of the distance to the price, relative to the price, e.g. price versus support.
+# Values without threshold are significant on any change.
+SIGNIFICANCE_THRESHOLDS = {
+    "rsi": {"rsi_value": ("absolute", 2.0)},
+    "macd": {"short_moving_average_value": ("relative", 0.005), "long_moving_average_value": ("relative", 0.005),
+             "signal_value": ("relative", 0.1)},
+    "bollinger_bands": {"bollinger_bands_moving_average_value": ("relative", 0.005),
+                        "bollinger_bands_above_standard_deviation_value": ("relative", 0.005),
+                        "bollinger_bands_below_standard_deviation_value": ("relative", 0.005)},
+    "prices": {"prices_value": ("relative", 0.005)},
+    "volumes": {"volumes_value": ("relative", 0.25)},
+    "support": {"close_value": ("price_distance", 0.0025), "middle_value": ("price_distance", 0.005), "far_value": ("price_distance", 0.01)},
+    "resistance": {"close_value": ("price_distance", 0.0025), "middle_value": ("price_distance", 0.005), "far_value": ("price_distance", 0.01)},
+}
+
+
+# Key of the price of the last computation in the raw values of the leaves with "price_distance" thresholds.
+REFERENCE_PRICE = "reference_price"
+
+
+def fingerprint(inputs: dict) -> str:
+    """Return the fingerprint of raw values."""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class TechnicalAnalysisChangeDetector():
+    """Detect the leaves of a timeframe whose raw values changed significantly."""
+
+    def __init__(self, thresholds: dict = None):
+        """
+        Args:
+            thresholds (dict): Significance thresholds of the raw values by leaf, see `SIGNIFICANCE_THRESHOLDS`.
+        """
+        self.thresholds = thresholds or SIGNIFICANCE_THRESHOLDS
+
+    def is_significant(self, node: str, name: str, previous, current, previous_price: float = None, current_price: float = None) -> bool:
+        """Return whether the change of a raw value is significant.
+
+        Args:
+            node (str): Name of the leaf, e.g. "rsi".
+            name (str): Name of the raw value, e.g. "rsi_value".
+            previous: Value of the last computation.
+            current: Current value.
+            previous_price (float): Price of the last computation, for the "price_distance" thresholds.
+            current_price (float): Current price, for the "price_distance" thresholds.
+        """
+        if previous is None or current is None:
+            return previous != current
+        kind, threshold = self.thresholds.get(node, {}).get(name, (None, None))
+        if kind == "price_distance" and previous_price and current_price:
+            # An unchanged level moves relatively to a moving price.
+            return abs((current - current_price) / current_price - (previous - previous_price) / previous_price) > threshold
+        if previous == current:
+            return False
+        if kind == "absolute":
+            return abs(current - previous) > threshold
+        if kind == "relative":
+            return abs(current - previous) > threshold * abs(previous) if previous else True
+        return True
+
+    def is_price_relative(self, node: str) -> bool:
+        """Return whether a leaf has raw values measured against the price."""
+        return any(kind == "price_distance" for kind, _ in self.thresholds.get(node, {}).values())
+
+    def changed_nodes(self, previous_inputs: dict, inputs: dict, nodes=None) -> set:
+        """Return the leaves of a timeframe whose raw values changed significantly.
+
+        A leaf without current or previous raw values is considered changed. The leaves measured against the price are
+        compared with the price of their own last computation.
+
+        Args:
+            previous_inputs (dict): Raw values of the last computation by leaf, see `reference_inputs`.
+            inputs (dict): Current raw values by leaf.
+            nodes: Names of the leaves of the timeframe, the leaves of the thresholds and of `inputs` by default.
+        """
+        current_price = inputs.get("prices", {}).get("prices_value")
+        changed = set()
+        for node in (nodes if nodes is not None else set(self.thresholds) | set(inputs)):
+            values = inputs.get(node)
+            previous_values = previous_inputs.get(node)
+            if values is None or previous_values is None:
+                changed.add(node)
+                continue
+            previous_values = dict(previous_values)
+            previous_price = previous_values.pop(REFERENCE_PRICE, previous_inputs.get("prices", {}).get("prices_value"))
+            if fingerprint(previous_values) == fingerprint(values) and (previous_price == current_price or not self.is_price_relative(node)):
+                continue
+            if any(self.is_significant(node, name, previous_values.get(name), value, previous_price=previous_price, current_price=current_price)
+                   for name, value in values.items()):
+                changed.add(node)
+        return changed
+
+    def reference_inputs(self, previous_inputs: dict, inputs: dict, changed: set = None) -> dict:
+        """Return the raw values of the last computation by leaf after a run, to store with its report.
+
+        The leaves measured against the price keep the price of their computation under `REFERENCE_PRICE`.
+
+        Args:
+            previous_inputs (dict): Raw values of the last computation by leaf before the run.
+            inputs (dict): Current raw values by leaf.
+            changed (set): Leaves computed by the run, every leaf if None. A leaf computed without raw values has none
+                afterwards, so that it is computed again at the next run.
+        """
+        current_price = inputs.get("prices", {}).get("prices_value")
+        reference = dict(previous_inputs) if changed is not None else {}
+        for node in changed or ():
+            if node not in inputs:
+                reference.pop(node, None)
+        for node, values in inputs.items():
+            if changed is not None and node not in changed:
+                continue
+            reference[node] = dict(values)
+            if current_price is not None and self.is_price_relative(node):
+                reference[node][REFERENCE_PRICE] = current_price
+        return reference
+
+
+class TechnicalAnalysisState():
+    """Previous reports of the tickers with the raw values of the last computation of their leaves, optionally persisted."""
+
+    def __init__(self, path: str = None):
+        """
+        Args:
+            path (str): Path of the JSON file persisting the states, kept in memory only if None.
+        """
+        self.path = path
+        self._states = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as state_file:
+                self._states = json.load(state_file)
+
+    def get(self, stock: str):
+        """Return the (previous report, raw values of the last computation by timeframe) of a ticker, (None, {}) if unknown."""
+        with self._lock:
+            state = self._states.get(stock)
+        if state is None:
+            return None, {}
+        return _pydantic_models.TickerTechnicalAnalysis.model_validate_json(state["report"]), state["inputs"]
+
+    def set(self, stock: str, report, inputs: dict):
+        """Store the report of a ticker with the raw values of the last computation of its leaves by timeframe."""
+        with self._lock:
+            self._states[stock] = {"report": report.model_dump_json(by_alias=True), "inputs": inputs}
+            if self.path:
+                temporary_path = self.path + ".tmp"
+                with open(temporary_path, "w") as state_file:
+                    json.dump(self._states, state_file)
+                os.replace(temporary_path, self.path)
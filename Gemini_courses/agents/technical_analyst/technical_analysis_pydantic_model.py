@@ -87,7 +87,7 @@ def create_generic_evaluation_model(evaluation_name: str, raw_tool_class: Option
                                                                                                   f" {evaluation_name.upper()} trend.")),
 
         # Configuration Pydantic pour la classe générée
-        'model_config': ConfigDict(populate_by_name=True),
+        'model_config': ConfigDict(populate_by_name=True, defer_build=True),
     }
 
     if raw_tool_class:
@@ -170,7 +170,7 @@ def create_support_resistance_evaluation_model(evaluation_name: str, raw_tool_cl
         # 'raw_tool_data': Field(None, alias=raw_tool_data_alias, description=f"Raw data specific to the {evaluation_name.upper()} tool."),
         'raw_tool_data': Field(None, alias=raw_tool_data_alias, description=f"Raw data specific to the {evaluation_name.upper()} tool."),
 
-        "model_config": ConfigDict(populate_by_name=True),
+        "model_config": ConfigDict(populate_by_name=True, defer_build=True),
     }
 
     attributes_dict["__annotations__"] = annotations
@@ -197,7 +197,7 @@ def create_support_resistance_raw_values_model(model_name: str) -> Type[BaseMode
         "middle_value": Field(..., alias=middle_value_alias, description=f"Raw value of the middle {model_name.upper()} in relation to the price."),
         "far_value": Field(..., alias=far_value_alias, description=f"Raw value of the farest {model_name.upper()} in relation to the price."),
 
-        "model_config": ConfigDict(populate_by_name=True),
+        "model_config": ConfigDict(populate_by_name=True, defer_build=True),
     }
 
     attributes_dict["__annotations__"] = annotations
@@ -210,19 +210,19 @@ def create_support_resistance_raw_values_model(model_name: str) -> Type[BaseMode
 class PRICESRawValue(BaseModel):
     """PRICES raw value provided by the chart."""
     prices_value: float = Field(alias="prices_value", description="PRICES raw value provided by the chart.")
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class VOLUMESRawValue(BaseModel):
     """VOLUMES raw value provided by the chart."""
     volumes_value: float = Field(alias="volumes_value", description="VOLUMES raw value provided by the chart.")
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class RSIRawValue(BaseModel):
     """RSI raw value provided by the RSI tool."""
     rsi_value: float = Field(alias="rsi_value", description="RSI raw value provided by the RSI tool.")
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class MACDRawValues(BaseModel):
@@ -230,7 +230,7 @@ class MACDRawValues(BaseModel):
     short_moving_average_value: float = Field(alias="short_moving_average_value", description="Short moving avering raw value provided by the MACD tool.")
     long_moving_average_value: float = Field(alias="long_moving_average_value", description="Long moving avering raw value provided by the MACD tool.")
     signal_value: float = Field(alias="signal_value", description="Signal raw value provided by the MACD tool.")
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class BollignerBandsRawValues(BaseModel):
@@ -241,7 +241,7 @@ class BollignerBandsRawValues(BaseModel):
                                                                   description=("Upper standard deviation provided by the Bollinger Bands tools."))
     bollinger_bands_below_standard_deviation_value: float = Field(alias="bollinger_bands_below_standard_deviation_value",
                                                                   description=("Lower standard deviation provided by the Bollinger Bands tools."))
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 # Submodels
@@ -256,7 +256,7 @@ class Indicators(BaseModel):
     rsi_evaluation: Optional[RSIEvaluation] = Field(None, alias="rsi_evaluation", description="RSI evaluation.")
     macd_evaluation: Optional[MACDEvaluation] = Field(None, alias="macd_evaluation", description="MACD evaluation.")
     bollinger_bands_evaluation: Optional[BOLLINGER_BANDSEvaluation] = Field(None, alias="bollinger_bands_evaluation", description="Bollinger Bands evaluation.")
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 # ## Support an d Resistance
@@ -291,7 +291,7 @@ class Synthesis(BaseModel):
         = Field(..., alias="synthese_support_resistance_interaction_implication",
                 description=("(enum) Category of the support implication, Type of category: SupportResistanceInteractionImplication"))
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 # ## Timeframe data
@@ -312,7 +312,7 @@ class ShortTimeframeData(BaseModel):
     short_timeframe_data_synthesis: Synthesis = Field(..., alias="short_timeframe_data_synthesis",
                                                       description="(Synthesis) Short timeframe data synthesis and conclusions.")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 class LongTimeframeData(BaseModel):
@@ -332,7 +332,7 @@ class LongTimeframeData(BaseModel):
     long_timeframe_data_synthesis: Synthesis = Field(..., alias="long_timeframe_data_synthesis",
                                                      description="(Synthesis) Long timeframe data synthesis and conclusions.")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
 
 
 # Model
@@ -347,4 +347,4 @@ class TickerTechnicalAnalysis(BaseModel):
                                                    description="(LongTimeframeData) Long timeframe data and synthesis.")
     synthesis: Synthesis = Field(..., alias="synthesis", description="(Synthesis) Synthesis and conslusions made on both shorter and longer timeframes data.")
 
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, defer_build=True)
@@ -0,0 +1 @@
+"""Pytest configuration: this directory is put on the import path, so that the tests import the `agents` package as the notebooks do."""
@@ -0,0 +1,69 @@
+from agents.technical_analyst.technical_analysis_incremental import REFERENCE_PRICE, TechnicalAnalysisChangeDetector
+
+
+def _inputs(price: float, support: float = 95.0) -> dict:
+    return {"prices": {"prices_value": price},
+            "support": {"close_value": support, "middle_value": support - 3, "far_value": support - 8}}
+
+
+def _run(detector: TechnicalAnalysisChangeDetector, prices: list) -> list:
+    """Return the leaves computed by every run of an incremental analysis over the prices."""
+    reference = detector.reference_inputs({}, _inputs(prices[0]))
+    runs = []
+    for price in prices[1:]:
+        inputs = _inputs(price)
+        changed = detector.changed_nodes(reference, inputs, nodes=("prices", "support"))
+        reference = detector.reference_inputs(reference, inputs, changed)
+        runs.append(changed)
+    return runs
+
+
+def test_reference_inputs_keep_the_price_of_the_price_relative_leaves():
+    detector = TechnicalAnalysisChangeDetector()
+    reference = detector.reference_inputs({}, _inputs(100.0))
+    assert reference["support"][REFERENCE_PRICE] == 100.0
+    assert REFERENCE_PRICE not in reference["prices"]
+
+    reference = detector.reference_inputs(reference, _inputs(101.0), changed={"prices"})
+    assert reference["prices"]["prices_value"] == 101.0
+    assert reference["support"][REFERENCE_PRICE] == 100.0
+
+
+def test_fixed_support_is_recomputed_when_the_price_drifts_every_run():
+    # The price rises 0.6% per run, the prices leaf is recomputed at every run and the distance of the fixed support
+    # to the price moves by more than its threshold at every run.
+    prices = [100.0 * 1.006 ** run for run in range(21)]
+    runs = _run(TechnicalAnalysisChangeDetector(), prices)
+    assert all("prices" in changed for changed in runs)
+    assert all("support" in changed for changed in runs)
+
+
+def test_fixed_support_is_recomputed_on_slow_drift():
+    # The price rises 0.1% per run: below the thresholds of a single run, the support is recomputed once the drift
+    # accumulated since its last computation is significant.
+    prices = [100.0 * 1.001 ** run for run in range(31)]
+    runs = _run(TechnicalAnalysisChangeDetector(), prices)
+    support_runs = [run for run, changed in enumerate(runs) if "support" in changed]
+    assert support_runs
+    assert len(support_runs) < len(runs)
+    assert support_runs[0] > 0
+
+
+def test_fixed_support_is_unchanged_with_a_fixed_price():
+    runs = _run(TechnicalAnalysisChangeDetector(), [100.0] * 10)
+    assert not any(runs)
+
+
+def test_leaves_without_raw_values_are_changed():
+    detector = TechnicalAnalysisChangeDetector()
+    reference = detector.reference_inputs({}, _inputs(100.0))
+    assert detector.changed_nodes(reference, {}, nodes=("prices", "support")) == {"prices", "support"}
+    assert detector.changed_nodes(reference, _inputs(100.0)) == {"rsi", "macd", "bollinger_bands", "resistance", "volumes"}
+
+
+def test_leaves_computed_without_raw_values_are_computed_again():
+    detector = TechnicalAnalysisChangeDetector()
+    reference = detector.reference_inputs({}, _inputs(100.0))
+    reference = detector.reference_inputs(reference, {"prices": {"prices_value": 100.0}}, changed={"support"})
+    assert "support" not in reference
+    assert "support" in detector.changed_nodes(reference, _inputs(100.0), nodes=("prices", "support"))
@@ -0,0 +1,151 @@
+"""Base of the analysts LLM logics.
+
+Every analyst generates its report node by node, a node being a Pydantic model generated by a structured LLM run
+with reasoning separation, retries on invalid outputs and deep thinking switchable per node. The analysts only
+define their prompt templates and their node entry points on top of `AnalystLLMLogic.generic_output_parser`.
+"""
+from collections import deque
+
+from .models import MODEL_REGISTRY as _MODEL_REGISTRY
+from . import reasoning as _reasoning
+
+
+class AnalystLLMLogic():
+    """Structured LLM runs shared by the analysts."""
+
+    MODEL_REGISTRY = _MODEL_REGISTRY
+    # Number of timers and reasoning records kept, so that a long running instance does not grow unbounded.
+    MAX_RECORDS = 1000
+    PROMPT_TEMPLATES = {}
+    DEEP_THINKING_INSTRUCTION = "Enable deep thinking subroutine.\n\n"
+    RETRY_PROMPT_TEMPLATE = None
+
+    @classmethod
+    def get_retry_prompt_template(cls) -> str:
+        """Return the retry prompt template, built once at first use."""
+        if AnalystLLMLogic.RETRY_PROMPT_TEMPLATE is None:
+            from langchain.output_parsers.retry import NAIVE_RETRY_WITH_ERROR_PROMPT
+
+            retry_template = NAIVE_RETRY_WITH_ERROR_PROMPT.template.split("\n")
+            retry_template = retry_template[:-1] + ["YOU MUST RESPECT THE SCHEMA PROVIDED IN THE PROMPT."] + retry_template[-1:]
+            AnalystLLMLogic.RETRY_PROMPT_TEMPLATE = "\n".join(retry_template)
+        return AnalystLLMLogic.RETRY_PROMPT_TEMPLATE
+
+    @classmethod
+    def get_prompt_template(cls, pydantic_model, system_prompt_template: str, input_variables: list) -> tuple:
+        """Return the (output parser, prompt template) of a node, built once and reused afterwards.
+
+        Args:
+            pydantic_model: The Pydantic model to product the return on.
+            system_prompt_template (str): System prompt template for this LLM run.
+            input_variables (list): PromptTemplate input variables.
+        """
+        key = (pydantic_model, system_prompt_template, tuple(input_variables))
+        prompt = cls.PROMPT_TEMPLATES.get(key)
+        if prompt is None:
+            from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
+            from langchain_core.output_parsers import PydanticOutputParser
+
+            evaluation_parser = PydanticOutputParser(pydantic_object=pydantic_model)
+            prompt_template = ChatPromptTemplate([
+                SystemMessagePromptTemplate.from_template(template=system_prompt_template),
+                HumanMessagePromptTemplate.from_template(template="{stock}"),
+                ],
+                input_variables=list(input_variables),
+                partial_variables={"format_instructions": evaluation_parser.get_format_instructions()}
+            )
+            prompt = cls.PROMPT_TEMPLATES[key] = (evaluation_parser, prompt_template)
+        return prompt
+
+    def __init__(self, stock: str, model_params: dict = None, deep_thinking=True):
+        """
+        Args:
+            stock (str): Ticker of the stock to analyse.
+            model_params (dict): Additionnal parameters of the chat models, e.g. {"base_url": "http://localhost:11434"}.
+            deep_thinking (bool | dict): Whether to enable the deep thinking of the model, for every node or by the name of
+                its Pydantic model. The latency and token cost of every node are recorded in `reasoning_stats`.
+        """
+        self.stock = stock
+        self.model_params = model_params or {}
+        self.deep_thinking = deep_thinking
+        self.reasoning_stats = _reasoning.ReasoningStats(max_runs=self.MAX_RECORDS)
+        self.timers = deque(maxlen=self.MAX_RECORDS)
+
+    def is_deep_thinking(self, node: str, default: bool = True) -> bool:
+        """Return whether the deep thinking of the model is enabled for an analysis node.
+
+        Args:
+            node (str): Name of the node, the name of its Pydantic model.
+            default (bool): Whether the deep thinking of the node is enabled when not set by node.
+        """
+        if isinstance(self.deep_thinking, dict):
+            return self.deep_thinking.get(node, default)
+        return bool(self.deep_thinking) and default
+
+    def generic_output_parser(self, pydantic_model, system_prompt_template: str, input_variables: list = None, json_docs: dict = None,
+                              stock: str = None, factor: int = 1):
+        """Generic template to generate Pydantic outputs.
+
+        Args:
+            pydantic_model: The Pydantic model to product the return on.
+            system_prompt_template (str): System prompt template for this LLM run.
+            input_variables (list): PromptTemplate additionnal input variables.
+            json_docs (dict): Additionnal values from documentations to pass at model invocation.
+            stock (str): Companies of this LLM run, `self.stock` if None.
+            factor (int): Factor of the context and prediction sizes, for the big prompts.
+        """
+        # Heavy LangChain imports are deferred to the first LLM run to keep the import of the module fast.
+        from langchain_core.prompts import PromptTemplate
+        from langchain.output_parsers.retry import RetryWithErrorOutputParser
+        from langchain_core.runnables import RunnableParallel, RunnableLambda
+
+        node = pydantic_model.__name__
+        deep_thinking = self.is_deep_thinking(node)
+        instruction = self.DEEP_THINKING_INSTRUCTION if deep_thinking else ""
+        run = self.reasoning_stats.start(node, deep_thinking)
+        init_input_variables = ["stock"]
+        invocation = {"stock": stock or self.stock}
+        if input_variables:
+            init_input_variables += input_variables
+        if json_docs:
+            invocation.update(json_docs)
+
+        evaluation_parser, prompt_template = self.get_prompt_template(pydantic_model, instruction + system_prompt_template, init_input_variables)
+
+        error_model = self.MODEL_REGISTRY.resolve(pydantic_model=pydantic_model, num_ctx=4092 * 4 * factor, num_predict=1000 * 4 * factor,
+                                                  extract_reasoning=True, **self.model_params)
+
+        def _retry_answer(message):
+            reasoning, answer = _reasoning.message_reasoning(message)
+            self.reasoning_stats.add_message(run, message, reasoning=reasoning, answer=answer, retry=True)
+            return answer
+
+        retry_parser = RetryWithErrorOutputParser(
+            parser=evaluation_parser,
+            retry_chain=PromptTemplate.from_template(instruction + self.get_retry_prompt_template()) | error_model | _retry_answer,
+            max_retries=15,
+        )
+
+        structured_model = self.MODEL_REGISTRY.resolve(pydantic_model=pydantic_model, structured_output=True, include_raw=True,
+                                                       num_ctx=4092 * 2 * factor, num_predict=1000 * 2 * factor, extract_reasoning=True,
+                                                       **self.model_params)
+
+        def _parse_completion(response):
+            # Only the answer is parsed and retried, the reasoning never reaches the retry and parent prompts.
+            completion = response["completion"]
+            reasoning, answer = _reasoning.message_reasoning(completion["raw"])
+            self.reasoning_stats.add_message(run, completion["raw"], reasoning=reasoning, answer=answer)
+            if completion["parsed"] is not None:
+                answer = completion["parsed"].model_dump_json()
+            return retry_parser.parse_with_prompt(completion=answer, prompt_value=response["prompt_value"])
+
+        chain = RunnableParallel(
+            completion=prompt_template | structured_model, prompt_value=prompt_template
+        ) | RunnableLambda(_parse_completion)
+
+        response = chain.invoke(invocation)
+
+        self.timers.append(self.reasoning_stats.finish(run))
+        print("\t\t\tTime:", self.timers[-1])
+
+        return response
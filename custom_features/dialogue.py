@@ -0,0 +1,186 @@
+"""Bounded-memory dialogue between several agents.
+
+The transcript shared by the agents is a ring buffer: its memory use stays flat however long the dialogue is.
+Every agent sees its own view of it: its system message, a summary of the older turns if enabled, and a
+window of the last turns, its own ones as AI messages and the other agents ones as human messages.
+
+Replies are streamed and the stop conditions are checked on the streamed tokens, so a reply is cut as soon
+as a condition is met. The summaries of the turns leaving the windows are updated in background while the
+next speaker streams its reply. The turns leaving a window are kept by the agent until its next summary update,
+so that none is lost when the ring buffer evicts it or while a previous update is still running.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+
+class DialogueAgent():
+    """Agent of a dialogue with its own windowed or summarized view of the shared transcript."""
+
+    SUMMARY_PROMPT = ("Progressively summarize the lines of the conversation provided, adding onto the previous summary. "
+                      "Return only the new summary.\n\nCurrent summary:\n{summary}\n\nNew lines of conversation:\n{lines}")
+
+    def __init__(self, name: str, llm, system_message: str, window: int = 10, summarize: bool = False):
+        """
+        Args:
+            name (str): Name of the agent, e.g. "Alice".
+            llm: Chat model of the agent.
+            system_message (str): System message of the agent.
+            window (int): Number of the last turns of the transcript seen by the agent, at least 1.
+            summarize (bool): Whether to keep a summary of the turns older than the window.
+        """
+        if window < 1:
+            raise ValueError(f"The window of {name} must be at least 1 turn, got {window}.")
+        self.name = name
+        self.llm = llm
+        self.system_message = system_message
+        self.window = window
+        self.summarize = summarize
+        self.summary = ""
+        self.summarized_until = 0
+        self.pending_turns = []
+
+    def view(self, transcript) -> list:
+        """Return the messages seen by the agent.
+
+        Args:
+            transcript: Turns of the dialogue as (turn number, speaker name, content) tuples.
+        """
+        system_message = self.system_message
+        if self.summary:
+            system_message += f"\n\nSummary of the previous conversation:\n{self.summary}"
+        messages = [SystemMessage(system_message)]
+        for _, speaker, content in list(transcript)[-self.window:]:
+            if speaker == self.name:
+                messages.append(AIMessage(content))
+            else:
+                messages.append(HumanMessage(f"{speaker}: {content}"))
+        return messages
+
+    def leave_window(self, turn: tuple):
+        """Keep a turn leaving the window of the agent until the next summary update, if summarizing."""
+        if self.summarize:
+            self.pending_turns.append(turn)
+
+    def turns_to_summarize(self) -> list:
+        """Return and clear the turns which left the window of the agent and are not summarized yet."""
+        turns, self.pending_turns = self.pending_turns, []
+        return turns
+
+    def update_summary(self, turns: list):
+        """Fold turns into the summary of the agent.
+
+        Args:
+            turns (list): Turns of the dialogue as (turn number, speaker name, content) tuples.
+        """
+        lines = "\n".join(f"{speaker}: {content}" for _, speaker, content in turns)
+        response = self.llm.invoke([HumanMessage(self.SUMMARY_PROMPT.format(summary=self.summary or "(empty)", lines=lines))])
+        self.summary = response.content
+        self.summarized_until = turns[-1][0] + 1
+
+
+class DialogueRunner():
+    """Run a dialogue between several agents speaking in turn."""
+
+    def __init__(self, agents: list, transcript_size: int = 50, stop_conditions: tuple = (), on_token=None, max_workers: int = 2):
+        """
+        Args:
+            agents (list): The `DialogueAgent` of the dialogue, in speaking order.
+            transcript_size (int): Maximum number of turns kept in the transcript ring buffer.
+            stop_conditions (tuple): Strings or functions taking the reply streamed so far and returning a bool.
+                The dialogue stops as soon as a string is in the reply or a function returns True.
+            on_token: Function called with the speaker name and every streamed token, e.g. to print them.
+            max_workers (int): Number of threads updating the summaries in background.
+        """
+        for agent in agents:
+            if agent.window > transcript_size:
+                raise ValueError(f"The window of {agent.name} ({agent.window}) is larger than the transcript size ({transcript_size}).")
+        self.agents = agents
+        self.transcript = deque(maxlen=transcript_size)
+        self.stop_conditions = stop_conditions
+        self.on_token = on_token
+        self.turn = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._summaries = {}
+
+    def _is_stopped(self, reply: str) -> bool:
+        """Check the stop conditions on the reply streamed so far."""
+        for condition in self.stop_conditions:
+            if condition(reply) if callable(condition) else condition in reply:
+                return True
+        return False
+
+    def _append(self, speaker: str, content: str):
+        """Add a turn to the transcript, handing the turns leaving the windows to their agents first."""
+        for agent in self.agents:
+            if len(self.transcript) >= agent.window:
+                agent.leave_window(self.transcript[-agent.window])
+        self.transcript.append((self.turn, speaker, content))
+        self.turn += 1
+
+    def _schedule_summaries(self):
+        """Update in background the summaries of the agents whose window the oldest turns left.
+
+        The error of a failed summary update is raised here, at the turn following it.
+        """
+        for agent in self.agents:
+            future = self._summaries.get(agent.name)
+            if future is not None:
+                if not future.done():
+                    continue
+                del self._summaries[agent.name]
+                if future.exception() is not None:
+                    raise RuntimeError(f"The summary update of {agent.name} failed.") from future.exception()
+            turns = agent.turns_to_summarize()
+            if turns:
+                self._summaries[agent.name] = self._executor.submit(agent.update_summary, turns)
+
+    def speak(self, agent: DialogueAgent) -> tuple:
+        """Stream the reply of an agent, add it to the transcript and return it with the stop status.
+
+        Args:
+            agent (DialogueAgent): The speaking agent.
+        """
+        reply = ""
+        stopped = False
+        stream = agent.llm.stream(agent.view(self.transcript))
+        try:
+            for chunk in stream:
+                reply += chunk.content
+                if self.on_token:
+                    self.on_token(agent.name, chunk.content)
+                if self._is_stopped(reply):
+                    stopped = True
+                    break
+        finally:
+            stream.close()
+
+        self._append(agent.name, reply)
+        self._schedule_summaries()
+        return reply, stopped
+
+    def run(self, max_turns: int = 20, opening: str = None, opening_speaker: str = "User") -> list:
+        """Run the dialogue until a stop condition is met or the maximum number of turns is reached.
+
+        Args:
+            max_turns (int): Maximum number of turns.
+            opening (str): Optional opening message added to the transcript before the first turn.
+            opening_speaker (str): Name of the speaker of the opening message.
+        """
+        if opening:
+            self._append(opening_speaker, opening)
+        for turn in range(max_turns):
+            agent = self.agents[turn % len(self.agents)]
+            _, stopped = self.speak(agent)
+            if stopped:
+                break
+        return list(self.transcript)
+
+    def close(self):
+        """Wait for the summaries in progress, release the background threads and raise the error of a failed summary update."""
+        self._executor.shutdown(wait=True)
+        for name, future in list(self._summaries.items()):
+            del self._summaries[name]
+            if future.exception() is not None:
+                raise RuntimeError(f"The summary update of {name} failed.") from future.exception()
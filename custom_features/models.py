@@ -1,6 +1,216 @@
-"""List of models and related providers."""
+"""List of models and related providers.
+
+Every entry of `MODELS` describes a model and its capabilities:
+- "model" (str): Name of the model at the provider.
+- "model_provider" (str): LangChain provider name, e.g. "mistralai" or "ollama".
+- "context_size" (int): Maximum context size in tokens.
+- "structured_output" (bool): Whether the model supports `with_structured_output`.
+- "streaming" (bool): Whether the model supports streaming.
+- "timeout" (float): Request timeout in seconds before falling back to the next model.
+- "params" (dict): Default parameters passed to the chat model constructor.
+- "rate_limited" (bool): Whether to throttle the model with the rate limiter shared by its provider and API key.
+
+`ROUTING_RULES` sends small leaf schemas to small fast models and big aggregate syntheses to larger ones.
+Rules are checked in order, the first rule whose "max_schema_size" (size in characters of the JSON schema)
+is greater than the schema size, or None, is used. Its "models" are tried in order, the next one being used
+as fallback on timeouts, connection errors and Ollama errors such as a model not pulled on the host, so that a host
+with only "cogito:8b" still runs every analysis.
+
+`RESIDENCY` configures the `OllamaResidencyManager` snapping the Ollama context sizes to fixed buckets and pinning
+the models in memory, so that the local Ollama server does not reload them when the context size changes.
+"""
+import json
+from threading import Lock
 
 
 MODELS = [
-    {"model": "open-mistral-7b", "model_provider": "mistralai"}
+    {"model": "open-mistral-7b", "model_provider": "mistralai", "context_size": 32768, "structured_output": True, "streaming": True,
+     "timeout": 120, "rate_limited": True},
+    {"model": "cogito:3b", "model_provider": "ollama", "context_size": 131072, "structured_output": True, "streaming": True,
+     "timeout": 300, "params": {"num_gpu": 256}},
+    {"model": "cogito:8b", "model_provider": "ollama", "context_size": 131072, "structured_output": True, "streaming": True,
+     "timeout": 600, "params": {"num_gpu": 256}},
+    {"model": "cogito:14b", "model_provider": "ollama", "context_size": 131072, "structured_output": True, "streaming": True,
+     "timeout": 900, "params": {"num_gpu": 256}},
+]
+
+ROUTING_RULES = [
+    {"max_schema_size": 6000, "models": ["cogito:3b", "cogito:8b"]},
+    {"max_schema_size": None, "models": ["cogito:14b", "cogito:8b"]},
 ]
+
+RESIDENCY = {"buckets": (16384,), "keep_alive": -1}
+
+
+class ModelRegistry():
+    """Registry of the models, their capabilities and their pooled clients."""
+
+    OLLAMA_ONLY_PARAMS = ("num_ctx", "num_gpu", "keep_alive", "base_url", "extract_reasoning")
+
+    def __init__(self, models: list = None, routing_rules: list = None, residency: dict = None):
+        """
+        Args:
+            models (list): Models descriptions, see `MODELS`.
+            routing_rules (list): Routing rules, see `ROUTING_RULES`.
+            residency (dict): Options of the Ollama residency manager, see `RESIDENCY`, or False to disable it.
+        """
+        self.models = {model_info["model"]: model_info for model_info in (models if models is not None else MODELS)}
+        self.routing_rules = routing_rules if routing_rules is not None else ROUTING_RULES
+        self.residency_options = residency if residency is not None else RESIDENCY
+        self._residency = None
+        self._clients = {}
+        self._lock = Lock()
+
+    @property
+    def residency(self):
+        """Return the Ollama residency manager, None if disabled."""
+        if self._residency is None and self.residency_options:
+            from .residency import OllamaResidencyManager
+
+            self._residency = OllamaResidencyManager(**self.residency_options)
+        return self._residency
+
+    def get_model_info(self, model: str) -> dict:
+        """Return the description of a registered model.
+
+        Args:
+            model (str): Name of the model, e.g. "cogito:8b".
+        """
+        try:
+            return self.models[model]
+        except KeyError:
+            raise ValueError(f"Unknown model '{model}'. Registered models: {list(self.models)}") from None
+
+    def _provider_params(self, model_info: dict, params: dict) -> dict:
+        """Merge default and requested parameters and adapt them to the model provider."""
+        provider_params = dict(model_info.get("params", {}))
+        provider_params.update(params)
+        if model_info["model_provider"] == "ollama":
+            provider_params.setdefault("client_kwargs", {"timeout": model_info.get("timeout")})
+            residency = self.residency
+            if residency is not None:
+                keep_alive = provider_params.get("keep_alive", residency.keep_alive)
+                provider_params.update(residency.params(num_ctx=provider_params.get("num_ctx"), base_url=provider_params.get("base_url")),
+                                       keep_alive=keep_alive)
+                provider_params["callbacks"] = list(provider_params.get("callbacks") or []) + [residency.get_callback_handler()]
+        else:
+            for name in self.OLLAMA_ONLY_PARAMS:
+                provider_params.pop(name, None)
+            if "num_predict" in provider_params:
+                provider_params["max_tokens"] = provider_params.pop("num_predict")
+            provider_params.setdefault("timeout", model_info.get("timeout"))
+        if model_info.get("rate_limited"):
+            from .rate_limiters import get_rate_limiter
+
+            rate_limiter = get_rate_limiter(model_info["model_provider"], api_key=provider_params.get("api_key"))
+            provider_params.setdefault("rate_limiter", rate_limiter)
+            provider_params.setdefault("callbacks", [rate_limiter.get_callback_handler()])
+        return provider_params
+
+    def get_client(self, model: str, **params):
+        """Return the pooled chat model client for a model and its parameters.
+
+        Clients are created once per provider, model and parameters and reused afterwards.
+
+        Args:
+            model (str): Name of the model, e.g. "cogito:8b".
+            params: Additionnal parameters of the chat model, e.g. num_ctx=8184.
+        """
+        model_info = self.get_model_info(model)
+        provider_params = self._provider_params(model_info, params)
+        key = (model_info["model_provider"], model, json.dumps(provider_params, sort_keys=True, default=id))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                from langchain.chat_models import init_chat_model
+
+                client = init_chat_model(model=model, model_provider=model_info["model_provider"], **provider_params)
+                if model_info.get("rate_limited"):
+                    provider_params["rate_limiter"].watch_responses(client)
+                self._clients[key] = client
+        return client
+
+    def warm_up_ollama(self, models: list = None) -> dict:
+        """Load the Ollama models in every context size bucket of the residency manager.
+
+        Args:
+            models (list): Names of the Ollama models, every registered Ollama model by default.
+        """
+        if models is None:
+            models = [model for model, model_info in self.models.items() if model_info["model_provider"] == "ollama"]
+        return self.residency.warm_up(models)
+
+    @staticmethod
+    def schema_size(pydantic_model) -> int:
+        """Return the size in characters of the JSON schema of a Pydantic model."""
+        return len(json.dumps(pydantic_model.model_json_schema()))
+
+    def route(self, pydantic_model=None, context_size: int = None, structured_output: bool = False, streaming: bool = False) -> list:
+        """Return the ordered list of the models able to handle a request.
+
+        Args:
+            pydantic_model: The Pydantic model of the expected output, if any. Its schema size selects the routing rule.
+            context_size (int): Required context size in tokens.
+            structured_output (bool): Whether structured output is required.
+            streaming (bool): Whether streaming is required.
+        """
+        size = self.schema_size(pydantic_model) if pydantic_model is not None else 0
+        for rule in self.routing_rules:
+            if rule["max_schema_size"] is None or size <= rule["max_schema_size"]:
+                candidates = rule["models"]
+                break
+        else:
+            candidates = list(self.models)
+
+        models = []
+        for model in candidates:
+            model_info = self.get_model_info(model)
+            if context_size and model_info["context_size"] < context_size:
+                continue
+            if structured_output and not model_info["structured_output"]:
+                continue
+            if streaming and not model_info["streaming"]:
+                continue
+            models.append(model)
+        if not models:
+            raise ValueError(f"No model of {candidates} handles context_size={context_size}, structured_output={structured_output}, "
+                             f"streaming={streaming}.")
+        return models
+
+    @staticmethod
+    def fallback_exceptions() -> tuple:
+        """Return the exceptions triggering the fallback to the next model."""
+        import httpx
+
+        exceptions = (TimeoutError, ConnectionError, httpx.TimeoutException, httpx.ConnectError)
+        try:
+            from ollama import ResponseError
+        except ImportError:
+            return exceptions
+        # Ollama answers 404 for a model not pulled on the host.
+        return exceptions + (ResponseError,)
+
+    def resolve(self, pydantic_model=None, structured_output: bool = False, streaming: bool = False, include_raw: bool = False, **params):
+        """Return a runnable routed to the best model, falling back automatically on timeouts, connection errors and missing models.
+
+        Args:
+            pydantic_model: The Pydantic model of the expected output, if any.
+            structured_output (bool): Whether to bind the Pydantic model as structured output.
+            streaming (bool): Whether streaming is required.
+            include_raw (bool): With structured output, whether to return the raw message with the parsed output, as a
+                {"raw": ..., "parsed": ..., "parsing_error": ...} dict.
+            params: Additionnal parameters of the chat model, e.g. num_ctx=8184.
+        """
+        models = self.route(pydantic_model=pydantic_model, context_size=params.get("num_ctx"), structured_output=structured_output,
+                            streaming=streaming)
+        runnables = []
+        for model in models:
+            client = self.get_client(model, **params)
+            runnables.append(client.with_structured_output(pydantic_model, include_raw=include_raw) if structured_output else client)
+
+        if len(runnables) == 1:
+            return runnables[0]
+        return runnables[0].with_fallbacks(runnables[1:], exceptions_to_handle=self.fallback_exceptions())
+
+
+MODEL_REGISTRY = ModelRegistry()
@@ -0,0 +1,401 @@
+"""Adaptive token-bucket rate limiters shared across agents.
+
+A rate limiter throttles both the requests and the tokens sent to a provider for a given API key, the key set in
+the environment of the provider (e.g. MISTRAL_API_KEY) when none is given. Its state is kept in a store shared by every limiter of the same provider and API key:
+- `InMemoryBucketStore` shares it between the threads and asyncio tasks of a process.
+- `SQLiteBucketStore` shares it between the processes of a host through a SQLite file.
+
+The rates adapt to the quota really granted by the provider: they increase slowly on successes, are halved
+on 429 errors and are aligned on the rate limit headers when they are available. The headers of the 429 errors are
+always read, the headers of the successful responses only for the chat models watched with `watch_responses`, the
+LangChain chat models not exposing them otherwise. Without them, the maximum rate stays at `DEFAULT_LIMITS`.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.rate_limiters import BaseRateLimiter
+
+
+DEFAULT_LIMITS = {
+    "mistralai": {"requests_per_second": 1, "tokens_per_minute": 500000},
+}
+API_KEY_ENVIRONMENT_VARIABLES = {
+    "mistralai": "MISTRAL_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+    "google_genai": "GOOGLE_API_KEY",
+}
+# Time in seconds before a limit exhausted by the provider resets, when its headers do not give it.
+DEFAULT_RESET_WINDOWS = {"requests": 1, "tokens": 60}
+DEFAULT_SQLITE_PATH = os.path.join(tempfile.gettempdir(), "langchain_courses_rate_limits.sqlite")
+
+
+class InMemoryBucketStore():
+    """Buckets states shared between the threads and the asyncio tasks of a process."""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def update(self, key: str, function):
+        """Atomically apply a function on a bucket state and return its result.
+
+        Args:
+            key (str): Key of the bucket state.
+            function: Function taking the state (dict, empty if new) to update in place and returning the result.
+        """
+        with self._lock:
+            state = self._states.setdefault(key, {})
+            return function(state)
+
+
+class SQLiteBucketStore():
+    """Buckets states shared between the processes of a host through a SQLite file."""
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        """
+        Args:
+            path (str): Path of the SQLite file.
+        """
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        """Return the connection of the current thread, SQLite connections can not be shared between threads."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, state TEXT NOT NULL)")
+            self._local.connection = connection
+        return connection
+
+    def update(self, key: str, function):
+        """Atomically apply a function on a bucket state and return its result.
+
+        Args:
+            key (str): Key of the bucket state.
+            function: Function taking the state (dict, empty if new) to update in place and returning the result.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT state FROM buckets WHERE key = ?", (key,)).fetchone()
+            state = json.loads(row[0]) if row else {}
+            result = function(state)
+            connection.execute("INSERT OR REPLACE INTO buckets (key, state) VALUES (?, ?)", (key, json.dumps(state)))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return result
+
+
+def _parse_duration(value: str) -> float:
+    """Parse a rate limit reset duration, e.g. "2", "1.5", "20ms" or "6m0s", in seconds."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        seconds += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return seconds
+
+
+class AdaptiveRateLimiter(BaseRateLimiter):
+    """Rate limiter throttling requests and tokens with adaptive token buckets.
+
+    Requests are limited by a bucket refilled at `requests_per_second`. Tokens are limited by a bucket refilled
+    at `tokens_per_minute`, the tokens used by a response are recorded afterwards and a request waits for the
+    token bucket to be positive again.
+    """
+
+    def __init__(self, key: str, requests_per_second: float, tokens_per_minute: float = None, max_bucket_size: float = 1,
+                 min_requests_per_second: float = None, increase_ratio: float = 0.05, decrease_ratio: float = 0.5,
+                 check_every_n_seconds: float = 0.1, store=None):
+        """
+        Args:
+            key (str): Key of the shared state, e.g. "mistralai:<api key hash>".
+            requests_per_second (float): Maximum number of requests per second.
+            tokens_per_minute (float): Maximum number of tokens per minute, None not to limit tokens.
+            max_bucket_size (float): Maximum number of requests allowed in a burst.
+            min_requests_per_second (float): Minimum rate after decreases, a tenth of `requests_per_second` by default.
+            increase_ratio (float): Part of the maximum rate added after each success.
+            decrease_ratio (float): Factor applied to the rate after a rate limit error.
+            check_every_n_seconds (float): Maximum time between two checks of the buckets while waiting.
+            store: Store of the shared states, an `InMemoryBucketStore` by default.
+        """
+        self.key = key
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self.max_bucket_size = max_bucket_size
+        self.min_requests_per_second = min_requests_per_second or requests_per_second / 10
+        self.increase_ratio = increase_ratio
+        self.decrease_ratio = decrease_ratio
+        self.check_every_n_seconds = check_every_n_seconds
+        self.store = store if store is not None else InMemoryBucketStore()
+        self._callback_handler = None
+
+    def _refill(self, state: dict, now: float):
+        """Initialize the state if new and refill its buckets up to now."""
+        if not state:
+            state.update({
+                "rate": self.requests_per_second,
+                "max_rate": self.requests_per_second,
+                "tokens_per_minute": self.tokens_per_minute,
+                "requests": self.max_bucket_size,
+                "tokens": self.tokens_per_minute or 0,
+                "blocked_until": 0,
+                "updated": now,
+            })
+        elapsed = max(now - state["updated"], 0)
+        state["requests"] = min(self.max_bucket_size, state["requests"] + elapsed * state["rate"])
+        if state["tokens_per_minute"]:
+            state["tokens"] = min(state["tokens_per_minute"], state["tokens"] + elapsed * state["tokens_per_minute"] / 60)
+        state["updated"] = now
+
+    def _take(self, state: dict) -> float:
+        """Take a request from the buckets, return 0 on success or the time to wait before retrying."""
+        now = time.time()
+        self._refill(state, now)
+        waits = [state["blocked_until"] - now]
+        if state["requests"] < 1:
+            waits.append((1 - state["requests"]) / state["rate"])
+        if state["tokens_per_minute"] and state["tokens"] <= 0:
+            waits.append((1 - state["tokens"]) * 60 / state["tokens_per_minute"])
+        wait = max(waits)
+        if wait <= 0:
+            state["requests"] -= 1
+            return 0
+        return wait
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        """Attempt to acquire a request.
+
+        Args:
+            blocking (bool): Whether to wait until the request is acquired.
+        """
+        while True:
+            wait = self.store.update(self.key, self._take)
+            if not wait:
+                return True
+            if not blocking:
+                return False
+            time.sleep(min(wait, self.check_every_n_seconds))
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        """Attempt to acquire a request asynchronously.
+
+        Args:
+            blocking (bool): Whether to wait until the request is acquired.
+        """
+        while True:
+            wait = self.store.update(self.key, self._take)
+            if not wait:
+                return True
+            if not blocking:
+                return False
+            await asyncio.sleep(min(wait, self.check_every_n_seconds))
+
+    def record_usage(self, tokens: int):
+        """Remove the tokens used by a response from the token bucket.
+
+        Args:
+            tokens (int): Number of input and output tokens of the response.
+        """
+        def _record(state):
+            self._refill(state, time.time())
+            state["tokens"] -= tokens
+
+        self.store.update(self.key, _record)
+
+    def on_success(self):
+        """Increase the rate towards its maximum after a successful request."""
+        def _increase(state):
+            self._refill(state, time.time())
+            state["rate"] = min(state["max_rate"], state["rate"] + state["max_rate"] * self.increase_ratio)
+
+        self.store.update(self.key, _increase)
+
+    def on_rate_limited(self, retry_after: float = None):
+        """Decrease the rate and block the requests after a rate limit error.
+
+        Args:
+            retry_after (float): Time to wait in seconds before the next request, one request period by default.
+        """
+        def _decrease(state):
+            now = time.time()
+            self._refill(state, now)
+            state["rate"] = max(self.min_requests_per_second, state["rate"] * self.decrease_ratio)
+            state["requests"] = min(state["requests"], 0)
+            state["blocked_until"] = max(state["blocked_until"], now + (retry_after if retry_after is not None else 1 / state["rate"]))
+
+        self.store.update(self.key, _decrease)
+
+    def update_from_headers(self, headers):
+        """Align the buckets on the rate limit headers of a provider response.
+
+        Both the OpenAI like headers ("x-ratelimit-limit-requests", "x-ratelimit-remaining-tokens", ...) and the
+        Mistral ones ("x-ratelimitbysize-limit-minute", "x-ratelimitbysize-remaining-minute") are supported. When no
+        request or no token remains, the requests are blocked until the reset given by the headers, or for the
+        `DEFAULT_RESET_WINDOWS` of the exhausted limit when the headers do not give it.
+
+        Args:
+            headers: Response headers mapping.
+        """
+        headers = {name.lower(): value for name, value in headers.items()}
+
+        def _float(*names):
+            for name in names:
+                if name in headers:
+                    try:
+                        return float(headers[name])
+                    except ValueError:
+                        return None
+            return None
+
+        def _update(state):
+            now = time.time()
+            self._refill(state, now)
+            limit_requests = _float("x-ratelimit-limit-requests")
+            reset_requests = _parse_duration(headers["x-ratelimit-reset-requests"]) if "x-ratelimit-reset-requests" in headers else None
+            if limit_requests and reset_requests:
+                state["max_rate"] = max(limit_requests / reset_requests, self.min_requests_per_second)
+            remaining_requests = _float("x-ratelimit-remaining-requests")
+            if remaining_requests is not None and remaining_requests < 1:
+                state["requests"] = min(state["requests"], 0)
+                state["blocked_until"] = max(state["blocked_until"], now + (reset_requests or DEFAULT_RESET_WINDOWS["requests"]))
+
+            limit_tokens = _float("x-ratelimitbysize-limit-minute", "x-ratelimit-limit-tokens")
+            if limit_tokens:
+                state["tokens_per_minute"] = limit_tokens
+            remaining_tokens = _float("x-ratelimitbysize-remaining-minute", "x-ratelimit-remaining-tokens")
+            if remaining_tokens is not None and state["tokens_per_minute"]:
+                state["tokens"] = min(state["tokens"], remaining_tokens)
+            if remaining_tokens is not None and remaining_tokens <= 0:
+                # The refill of the local bucket would let the next request through at once, the provider one only resets later.
+                reset_tokens = _parse_duration(headers["x-ratelimit-reset-tokens"]) if "x-ratelimit-reset-tokens" in headers else None
+                state["blocked_until"] = max(state["blocked_until"], now + (reset_tokens or DEFAULT_RESET_WINDOWS["tokens"]))
+
+            retry_after = _float("retry-after")
+            if retry_after is not None:
+                state["blocked_until"] = max(state["blocked_until"], now + retry_after)
+
+        self.store.update(self.key, _update)
+
+    def watch_responses(self, chat_model):
+        """Align the buckets on the rate limit headers of every response of a chat model, successful ones included.
+
+        The headers are read through the event hooks of the HTTP clients of the chat model, e.g. `ChatMistralAI`.
+
+        Args:
+            chat_model: Chat model with httpx `client` and `async_client` attributes, left as is otherwise.
+        """
+        import httpx
+
+        def _hook(response):
+            self.update_from_headers(response.headers)
+
+        async def _async_hook(response):
+            self.update_from_headers(response.headers)
+
+        for name, client_type, hook in (("client", httpx.Client, _hook), ("async_client", httpx.AsyncClient, _async_hook)):
+            client = getattr(chat_model, name, None)
+            if isinstance(client, client_type):
+                client.event_hooks = {**client.event_hooks, "response": client.event_hooks["response"] + [hook]}
+        return chat_model
+
+    def get_callback_handler(self):
+        """Return the callback handler feeding this rate limiter with the chat model responses and errors."""
+        if self._callback_handler is None:
+            self._callback_handler = RateLimiterCallbackHandler(rate_limiter=self)
+        return self._callback_handler
+
+
+class RateLimiterCallbackHandler(BaseCallbackHandler):
+    """Callback handler recording the usage and the rate limit errors of a chat model in its rate limiter."""
+
+    def __init__(self, rate_limiter: AdaptiveRateLimiter):
+        """
+        Args:
+            rate_limiter (AdaptiveRateLimiter): Rate limiter to feed.
+        """
+        self.rate_limiter = rate_limiter
+
+    def on_llm_end(self, response, **kwargs):
+        """Record the tokens used by the response and increase the rate."""
+        tokens = 0
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        if token_usage:
+            tokens = token_usage.get("total_tokens", 0)
+        else:
+            for generations in response.generations:
+                for generation in generations:
+                    usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    tokens += usage_metadata.get("total_tokens", 0)
+        if tokens:
+            self.rate_limiter.record_usage(tokens)
+        self.rate_limiter.on_success()
+
+    def on_llm_error(self, error, **kwargs):
+        """Decrease the rate on rate limit errors."""
+        response = getattr(error, "response", None)
+        status_code = getattr(response, "status_code", None)
+        if status_code is None and "429" not in str(error):
+            return
+        if status_code not in (None, 429):
+            return
+        headers = getattr(response, "headers", None) or {}
+        self.rate_limiter.update_from_headers(headers)
+        retry_after = headers.get("retry-after")
+        self.rate_limiter.on_rate_limited(retry_after=_parse_duration(retry_after) if retry_after else None)
+
+
+_RATE_LIMITERS = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def resolve_api_key(provider: str, api_key=None) -> str:
+    """Return the API key used by the chat models of a provider, the one of its environment variable if none is given.
+
+    Args:
+        provider (str): LangChain provider name, e.g. "mistralai".
+        api_key: API key of the provider, as str or pydantic SecretStr.
+    """
+    if hasattr(api_key, "get_secret_value"):
+        api_key = api_key.get_secret_value()
+    if api_key:
+        return api_key
+    variable = API_KEY_ENVIRONMENT_VARIABLES.get(provider)
+    return os.environ.get(variable, "") if variable else ""
+
+
+def get_rate_limiter(provider: str, api_key: str = None, store=None, **limits) -> AdaptiveRateLimiter:
+    """Return the rate limiter shared by every agent of a provider and API key.
+
+    Args:
+        provider (str): LangChain provider name, e.g. "mistralai".
+        api_key (str): API key of the provider, the limits are applied per key. The key of the provider environment
+            variable is used if None, see `resolve_api_key`.
+        store: Store of the shared states, a `SQLiteBucketStore` shared by the processes of the host by default.
+        limits: `AdaptiveRateLimiter` arguments overriding the `DEFAULT_LIMITS` of the provider.
+    """
+    key_hash = hashlib.sha256(resolve_api_key(provider, api_key).encode()).hexdigest()[:16]
+    key = f"{provider}:{key_hash}"
+    with _RATE_LIMITERS_LOCK:
+        rate_limiter = _RATE_LIMITERS.get(key)
+        if rate_limiter is None:
+            arguments = dict(DEFAULT_LIMITS.get(provider, {"requests_per_second": 1}))
+            arguments.update(limits)
+            rate_limiter = AdaptiveRateLimiter(key=key, store=store if store is not None else SQLiteBucketStore(), **arguments)
+            _RATE_LIMITERS[key] = rate_limiter
+    return rate_limiter
@@ -0,0 +1,147 @@
+"""Separation of the reasoning of deep thinking models from their answers.
+
+Deep thinking models, e.g. cogito with the "Enable deep thinking subroutine." instruction, write their reasoning
+between <think> and </think> tags before the answer. Only the answer must be parsed, retried or forwarded to the
+prompts of the parent nodes, the reasoning is only measured.
+"""
+import re
+from collections import deque
+from time import time as _time
+
+
+THINK_START = "<think>"
+THINK_END = "</think>"
+THINK_PATTERN = re.compile(r"<think>.*?(</think>|$)", re.DOTALL)
+
+
+def split_reasoning(text: str) -> tuple:
+    """Return the (reasoning, answer) of a model response, an unclosed <think> block being reasoning."""
+    reasoning = []
+    for match in THINK_PATTERN.finditer(text):
+        reasoning.append(match.group(0)[len(THINK_START):len(match.group(0)) - len(match.group(1))].strip())
+    return "\n".join(reasoning), THINK_PATTERN.sub("", text).strip()
+
+
+def strip_reasoning(text: str) -> str:
+    """Return the answer of a model response without its <think> blocks."""
+    return split_reasoning(text)[1]
+
+
+def strip_reasoning_tags(text: str) -> str:
+    """Return a reasoning without its <think> and </think> tags."""
+    return text.replace(THINK_START, "").replace(THINK_END, "").strip()
+
+
+def message_reasoning(message) -> tuple:
+    """Return the (reasoning, answer) of a chat model message.
+
+    The reasoning is either in <think> blocks of the content, or already extracted by the model client, e.g. by
+    `ChatOllama(extract_reasoning=True)`, in the "reasoning_content" additionnal argument.
+    """
+    reasoning, answer = split_reasoning(message.content if isinstance(message.content, str) else "")
+    extracted = (getattr(message, "additional_kwargs", None) or {}).get("reasoning_content")
+    if extracted:
+        reasoning = "\n".join(part for part in (strip_reasoning_tags(extracted), reasoning) if part)
+    return reasoning, answer
+
+
+class ReasoningSplitter():
+    """Split a streamed model response into reasoning and answer chunks, the tags possibly spanning several chunks."""
+
+    def __init__(self):
+        self.in_reasoning = False
+        self.reasoning = ""
+        self.answer = ""
+        self._pending = ""
+
+    def feed(self, chunk: str) -> tuple:
+        """Consume a chunk of the response and return its (reasoning, answer) parts."""
+        text = self._pending + chunk
+        self._pending = ""
+        reasoning, answer = [], []
+        while text:
+            tag = THINK_END if self.in_reasoning else THINK_START
+            position = text.find(tag)
+            if position == -1:
+                # Keep the end of the chunk which could be the beginning of a tag.
+                keep = next((size for size in range(min(len(tag) - 1, len(text)), 0, -1) if tag.startswith(text[-size:])), 0)
+                self._pending = text[len(text) - keep:]
+                (reasoning if self.in_reasoning else answer).append(text[:len(text) - keep])
+                break
+            (reasoning if self.in_reasoning else answer).append(text[:position])
+            text = text[position + len(tag):]
+            self.in_reasoning = not self.in_reasoning
+        reasoning, answer = "".join(reasoning), "".join(answer)
+        self.reasoning += reasoning
+        self.answer += answer
+        return reasoning, answer
+
+    def close(self) -> tuple:
+        """Flush the end of the response and return its (reasoning, answer) parts."""
+        text = self._pending
+        self._pending = ""
+        if self.in_reasoning:
+            self.reasoning += text
+            return text, ""
+        self.answer += text
+        return "", text
+
+
+def token_usage(message, reasoning: str = "", answer: str = "") -> dict:
+    """Return the output and reasoning tokens of a chat model message.
+
+    The reasoning tokens are the ones reported by the provider if any, otherwise the output tokens pro rata of the
+    reasoning characters.
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    output_tokens = usage.get("output_tokens", 0)
+    reasoning_tokens = (usage.get("output_token_details") or {}).get("reasoning")
+    if reasoning_tokens is None:
+        characters = len(reasoning) + len(answer)
+        reasoning_tokens = round(output_tokens * len(reasoning) / characters) if characters else 0
+    return {"input_tokens": usage.get("input_tokens", 0), "output_tokens": output_tokens, "reasoning_tokens": reasoning_tokens}
+
+
+class ReasoningStats():
+    """Latency, token cost and validity of the LLM runs of the analysis nodes, with and without deep thinking."""
+
+    def __init__(self, max_runs: int = None):
+        """
+        Args:
+            max_runs (int): Number of most recent runs kept, every run if None.
+        """
+        self.runs = deque(maxlen=max_runs)
+
+    def start(self, node: str, deep_thinking: bool) -> dict:
+        """Start the record of a node LLM run, to be updated with `add_message` and `finish`."""
+        run = {"node": node, "deep_thinking": deep_thinking, "start": _time(), "latency": None, "input_tokens": 0, "output_tokens": 0,
+               "reasoning_tokens": 0, "retries": 0}
+        self.runs.append(run)
+        return run
+
+    @staticmethod
+    def add_message(run: dict, message, reasoning: str = "", answer: str = "", retry: bool = False):
+        """Add the token usage of a model message to a run."""
+        for name, value in token_usage(message, reasoning=reasoning, answer=answer).items():
+            run[name] += value
+        if retry:
+            run["retries"] += 1
+
+    @staticmethod
+    def finish(run: dict) -> float:
+        """Set the latency of a run and return it."""
+        run["latency"] = round(_time() - run["start"], 3)
+        return run["latency"]
+
+    def summary(self) -> dict:
+        """Return the mean latency, tokens and retries of the finished runs by (node, deep thinking)."""
+        groups = {}
+        for run in self.runs:
+            if run["latency"] is not None:
+                groups.setdefault((run["node"], run["deep_thinking"]), []).append(run)
+        summary = {}
+        for key, runs in groups.items():
+            summary[key] = {"runs": len(runs), "first_attempt_valid": sum(not run["retries"] for run in runs) / len(runs)}
+            for name in ("latency", "input_tokens", "output_tokens", "reasoning_tokens", "retries"):
+                summary[key][name] = round(sum(run[name] for run in runs) / len(runs), 3)
+        return summary
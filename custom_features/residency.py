@@ -0,0 +1,154 @@
+"""Residency of the Ollama models.
+
+A local Ollama server reloads a model whenever the context size of the requests changes, which costs seconds and
+drops the KV cache. The residency manager:
+- snaps the requested context sizes to a few fixed buckets, so that the normal and retry calls share a runner,
+- routes every bucket to its own Ollama server (e.g. one per port or GPU), the default server otherwise,
+- pins the models in memory with `keep_alive`,
+- pre-warms the models of every bucket,
+- records the reload events reported by Ollama through the load duration of the responses.
+
+With a single Ollama server, a single bucket big enough for every request is the only way to avoid the reloads.
+A request bigger than every bucket keeps its own context size, so that its prompt is never truncated, and is reported
+as a possible reload.
+"""
+import bisect
+import threading
+from collections import deque
+from time import time as _time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class OllamaResidencyManager():
+    """Context size buckets, keep alive pinning, pre-warming and reload monitoring of the Ollama models."""
+
+    # Load duration in seconds above which a response is considered as having (re)loaded its model.
+    RELOAD_THRESHOLD = 0.5
+
+    def __init__(self, buckets=(16384,), keep_alive=-1, base_url: str = None, max_events: int = 1000):
+        """
+        Args:
+            buckets: Context sizes in tokens, or dictionary of the Ollama server URLs by context size, e.g.
+                {8192: "http://localhost:11434", 32768: "http://localhost:11435"}.
+            keep_alive: Duration the models stay loaded after a request, -1 to keep them loaded forever.
+            base_url (str): URL of the default Ollama server, the Ollama default one if None.
+            max_events (int): Number of most recent reload events kept.
+        """
+        endpoints = buckets if isinstance(buckets, dict) else {bucket: None for bucket in buckets}
+        self.buckets = sorted(endpoints)
+        self.endpoints = {bucket: endpoints[bucket] or base_url for bucket in self.buckets}
+        self.keep_alive = keep_alive
+        self.base_url = base_url
+        self.reload_events = deque(maxlen=max_events)
+        self.requests = 0
+        self.reloads = 0
+        self.oversized_requests = {}
+        self._lock = threading.Lock()
+        self._callback_handler = None
+
+    def snap(self, num_ctx: int = None) -> int:
+        """Return the smallest bucket holding a context size, the context size itself if no bucket does.
+
+        Args:
+            num_ctx (int): Requested context size in tokens, the smallest bucket if None.
+        """
+        if num_ctx is None:
+            return self.buckets[0]
+        index = bisect.bisect_left(self.buckets, num_ctx)
+        if index < len(self.buckets):
+            return self.buckets[index]
+        with self._lock:
+            self.oversized_requests[num_ctx] = self.oversized_requests.get(num_ctx, 0) + 1
+            first = self.oversized_requests[num_ctx] == 1
+        if first:
+            print(f"Residency: num_ctx={num_ctx} is bigger than the biggest bucket ({self.buckets[-1]}), it is not snapped and may "
+                  f"reload the model.")
+        return num_ctx
+
+    def params(self, num_ctx: int = None, base_url: str = None) -> dict:
+        """Return the chat model parameters of a request: the bucket context size, its server and the keep alive.
+
+        Args:
+            num_ctx (int): Requested context size in tokens.
+            base_url (str): Ollama server URL requested explicitly, which prevails over the bucket one.
+        """
+        bucket = self.snap(num_ctx)
+        params = {"num_ctx": bucket, "keep_alive": self.keep_alive}
+        base_url = base_url or self.endpoints.get(bucket, self.endpoints[self.buckets[-1]])
+        if base_url:
+            params["base_url"] = base_url
+        return params
+
+    def warm_up(self, models: list, timeout: float = 600):
+        """Load every model in every bucket with an empty request, return the load durations in seconds by (model, bucket).
+
+        Args:
+            models (list): Names of the Ollama models, e.g. ["cogito:3b", "cogito:8b"].
+            timeout (float): Timeout of a model loading in seconds.
+        """
+        import httpx
+
+        durations = {}
+        for bucket in self.buckets:
+            base_url = (self.endpoints[bucket] or "http://localhost:11434").rstrip("/")
+            for model in models:
+                response = httpx.post(f"{base_url}/api/generate", timeout=timeout,
+                                      json={"model": model, "prompt": "", "keep_alive": self.keep_alive, "options": {"num_ctx": bucket}})
+                response.raise_for_status()
+                durations[(model, bucket)] = round(response.json().get("load_duration", 0) / 1e9, 3)
+                print(f"Warm up {model} (num_ctx={bucket}) on {base_url}: {durations[(model, bucket)]}s")
+        return durations
+
+    def loaded_models(self, base_url: str = None) -> list:
+        """Return the models loaded by an Ollama server, as listed by its /api/ps endpoint."""
+        import httpx
+
+        response = httpx.get(f"{(base_url or self.base_url or 'http://localhost:11434').rstrip('/')}/api/ps", timeout=10)
+        response.raise_for_status()
+        return response.json().get("models", [])
+
+    def record_response(self, response_metadata: dict):
+        """Record a response, and a reload event if its model was loaded for it."""
+        load_duration = (response_metadata.get("load_duration") or 0) / 1e9
+        with self._lock:
+            self.requests += 1
+            if load_duration > self.RELOAD_THRESHOLD:
+                self.reloads += 1
+                self.reload_events.append({"time": _time(), "model": response_metadata.get("model"), "load_duration": round(load_duration, 3)})
+
+    def report(self) -> dict:
+        """Return the number of requests and reload events, with the recent reload events by model and the oversized requests."""
+        with self._lock:
+            by_model = {}
+            for event in self.reload_events:
+                model = by_model.setdefault(event["model"], {"reloads": 0, "load_duration": 0.0})
+                model["reloads"] += 1
+                model["load_duration"] = round(model["load_duration"] + event["load_duration"], 3)
+            return {"requests": self.requests, "reloads": self.reloads, "models": by_model,
+                    "oversized_requests": dict(self.oversized_requests)}
+
+    def get_callback_handler(self):
+        """Return the callback handler recording the responses of the chat models."""
+        if self._callback_handler is None:
+            self._callback_handler = ResidencyCallbackHandler(self)
+        return self._callback_handler
+
+
+class ResidencyCallbackHandler(BaseCallbackHandler):
+    """Callback handler recording the load durations of the Ollama responses in a residency manager."""
+
+    def __init__(self, residency: OllamaResidencyManager):
+        """
+        Args:
+            residency (OllamaResidencyManager): Residency manager to feed.
+        """
+        self.residency = residency
+
+    def on_llm_end(self, response, **kwargs):
+        """Record the load duration of the responses."""
+        for generations in response.generations:
+            for generation in generations:
+                response_metadata = getattr(getattr(generation, "message", None), "response_metadata", None) or generation.generation_info or {}
+                if "load_duration" in response_metadata:
+                    self.residency.record_response(response_metadata)
@@ -0,0 +1,165 @@
+"""Cached and parallel tool execution for LangGraph nodes.
+
+`ToolExecutor` wraps any tool exposing `run(query)`, e.g. `DuckDuckGoSearchRun`, with:
+- a TTL and LRU cache keyed by the normalized query,
+- a parallel fan-out of several queries per topic merged into a single result,
+- the tool latency tracked per graph node.
+
+`StubSearchBackend` provides the same interface offline for tests.
+"""
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import monotonic as _monotonic
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query to use it as cache key: lower case and single spaces."""
+    return " ".join(query.lower().split())
+
+
+class TTLLRUCache():
+    """Thread-safe cache evicting the least recently used entries and the entries older than a TTL."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600):
+        """
+        Args:
+            maxsize (int): Maximum number of entries.
+            ttl (float): Time to live of the entries in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """Return the value of a key, or default if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or _monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Set the value of a key, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (_monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class StubSearchBackend():
+    """Local search backend returning canned results, for offline tests."""
+
+    def __init__(self, results: dict = None, default: str = "No result found for '{query}'."):
+        """
+        Args:
+            results (dict): Results by normalized query.
+            default (str): Result template of the unknown queries, formatted with the query.
+        """
+        self.results = {normalize_query(query): result for query, result in (results or {}).items()}
+        self.default = default
+        self.calls = []
+
+    def run(self, query: str) -> str:
+        """Return the canned result of a query."""
+        self.calls.append(query)
+        return self.results.get(normalize_query(query), self.default.format(query=query))
+
+
+class ToolExecutor():
+    """Execute a tool for graph nodes with a result cache and parallel queries."""
+
+    def __init__(self, tool, cache: TTLLRUCache = None, max_workers: int = 4, query_templates: tuple = ("{topic}",),
+                 max_latencies: int = 1000):
+        """
+        Args:
+            tool: The tool to execute, any object with a `run(query)` method.
+            cache (TTLLRUCache): Result cache, a new one by default.
+            max_workers (int): Maximum number of queries executed in parallel.
+            query_templates (tuple): Default queries made for a topic, formatted with the topic.
+            max_latencies (int): Number of most recent latencies kept per node, so that a long running graph does not grow unbounded.
+        """
+        self.tool = tool
+        self.cache = cache if cache is not None else TTLLRUCache()
+        self.max_workers = max_workers
+        self.query_templates = query_templates
+        self.max_latencies = max_latencies
+        self.latencies = {}
+        self._lock = Lock()
+
+    def _record_latency(self, node: str, latency: float):
+        """Record the latency of a tool execution for a node."""
+        with self._lock:
+            self.latencies.setdefault(node, deque(maxlen=self.max_latencies)).append(round(latency, 3))
+
+    def run(self, query: str, node: str = None) -> str:
+        """Return the tool result of a query, from the cache if available.
+
+        Args:
+            query (str): The query of the tool.
+            node (str): Name of the graph node to track the latency for.
+        """
+        key = normalize_query(query)
+        result = self.cache.get(key)
+        if result is None:
+            start_time = _monotonic()
+            result = self.tool.run(query)
+            if node:
+                self._record_latency(node, _monotonic() - start_time)
+            self.cache.set(key, result)
+        return result
+
+    def run_many(self, queries: list, node: str = None) -> dict:
+        """Return the tool results of several queries executed in parallel, by query.
+
+        Args:
+            queries (list): The queries of the tool, duplicates after normalization are run once.
+            node (str): Name of the graph node to track the latency for.
+        """
+        unique_queries = list({normalize_query(query): query for query in queries}.values())
+        if not unique_queries:
+            return {}
+        if len(unique_queries) == 1:
+            return {unique_queries[0]: self.run(unique_queries[0], node=node)}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique_queries))) as executor:
+            results = executor.map(lambda query: self.run(query, node=node), unique_queries)
+            return dict(zip(unique_queries, results))
+
+    def as_node(self, name: str, input_key: str = "topic", output_key: str = "informations", query_templates: tuple = None):
+        """Return a graph node running the tool on the queries of the state topic and merging the results.
+
+        Args:
+            name (str): Name of the graph node, used to track the latency.
+            input_key (str): State key of the topic.
+            output_key (str): State key updated with the merged results.
+            query_templates (tuple): Queries made for the topic, formatted with the topic. The executor ones by default.
+        """
+        templates = query_templates or self.query_templates
+
+        def node(state):
+            topic = state[input_key]
+            start_time = _monotonic()
+            results = self.run_many([template.format(topic=topic) for template in templates], node=name)
+            self._record_latency(f"{name}_total", _monotonic() - start_time)
+            if len(results) == 1:
+                return {output_key: next(iter(results.values()))}
+            return {output_key: "\n\n".join(f"[{query}]\n{result}" for query, result in results.items())}
+
+        return node